@@ -12,6 +12,10 @@ class NWInline(admin.TabularInline):
     model = NW
     extra = 1
 
+class JobProcessInline(admin.TabularInline):
+    model = JobProcess
+    extra = 0
+
 # Admins
 
 import csv
@@ -77,7 +81,9 @@ def export_to_csv(modeladmin, request, queryset):
 export_to_csv.short_description = 'Export to CSV (Google Sheets)'
 
 class SKUAdmin(admin.ModelAdmin):
-    list_display = ['Type0', 'Type1', 'thickness', 'width', 'length', 'manufacturer', 'note1']
+    list_display = ['display_name', 'Type0', 'Type1', 'thickness', 'width', 'length', 'manufacturer', 'note1']
+    list_select_related = ['manufacturer']
+    search_fields = ['display_name']
     actions = [export_to_excel, export_to_csv]
 
 class CoilPalletAdmin(admin.ModelAdmin):
@@ -86,7 +92,9 @@ class CoilPalletAdmin(admin.ModelAdmin):
     actions = [export_to_excel, export_to_csv]
 
 class CoilNumberAdmin(admin.ModelAdmin):
-    list_display = ['number', 'coilpallet', 'weight']
+    list_display = ['full_path', 'weight', 'status', 'remaining_weight']
+    list_filter = ['status']
+    search_fields = ['full_path']
     actions = [export_to_excel, export_to_csv]
 
 class LabelAdmin(admin.ModelAdmin):
@@ -97,6 +105,7 @@ class CoilOutAdmin(admin.ModelAdmin):
     list_display = ['coil_number', 'sku', 'full_coil_partial', 'coil_kg', 'type0', 
                     'get_job_number', 'get_job_name_short', 'get_job_qty', 
                     'department_cutting', 'note_1']
+    list_select_related = ['coil_number', 'sku', 'job', 'department_cutting']
 
     @admin.display(description='Job Number')
     def get_job_number(self, obj):
@@ -117,11 +126,17 @@ class CoilOutAdmin(admin.ModelAdmin):
 class JobAdmin(admin.ModelAdmin):
     list_display = ['job_number', 'job_name_short', 'job_qty', 'date_job']
     search_fields = ['job_number', 'job_name_short']
+    inlines = [JobProcessInline]
 
 class DepartmentAdmin(admin.ModelAdmin):
     list_display = ['name', 'description', 'created_at']
     search_fields = ['name', 'description']
 
+class ProcessDepartmentAdmin(admin.ModelAdmin):
+    list_display = ['process_name', 'department']
+    list_select_related = ['department']
+    search_fields = ['process_name', 'department__name']
+
 # Register your models here.
 admin.site.register(Profile)
 admin.site.register(Supplier)
@@ -135,4 +150,5 @@ admin.site.register(NW)
 admin.site.register(CoilOut, CoilOutAdmin)
 admin.site.register(Job, JobAdmin)
 admin.site.register(Department, DepartmentAdmin)
+admin.site.register(ProcessDepartment, ProcessDepartmentAdmin)
 
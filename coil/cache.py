@@ -0,0 +1,178 @@
+"""
+Two-tier cache backend: a small in-process LRU in front of a shared cache.
+
+Reads are served from the process-local tier when possible and fall back to
+the shared (file or database) cache, whose hits are copied into the local
+tier. Writes go to both. Entries stay in the local tier for at most
+``LOCAL_TIMEOUT`` seconds, which bounds how long another process's change
+can go unseen; data that must change together should use versioned keys.
+
+Configured as::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'coil.cache.TieredCache',
+            'OPTIONS': {'SHARED': 'shared', 'MAX_ENTRIES': 1000, 'LOCAL_TIMEOUT': 5},
+        },
+        'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', ...},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        super().__init__({**params, 'OPTIONS': {'MAX_ENTRIES': options.get('MAX_ENTRIES', 1000)}})
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Local tier. Values are pickled, as in LocMemCache, so callers never share
+    # a mutable object.
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+        return entry
+
+    def _local_set(self, key, value, timeout):
+        lifetime = self._local_timeout
+        if timeout is not None and timeout != DEFAULT_TIMEOUT:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            self._local_delete(key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[key] = (time.monotonic() + lifetime, data)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        entry = self._local_get(local_key)
+        if entry is not None:
+            return pickle.loads(entry[1])
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._local_set(local_key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            entry = self._local_get(self.make_and_validate_key(key, version=version))
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(entry[1])
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._local_set(self.make_key(key, version=version), value, None)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(local_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self.make_key(key, version=version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(local_key, value, timeout)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.shared.incr(key, delta, version=version)
+        self._local_set(local_key, value, None)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local_get(self.make_and_validate_key(key, version=version)) is not None:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+
+_MISSING = object()
+
+
+def get_version(name, shared=False):
+    """
+    Current version of the key namespace ``name``; embed it in cache keys so
+    that ``bump_version(name)`` retires all of them at once.
+
+    The local tier may serve a version up to ``LOCAL_TIMEOUT`` seconds old;
+    ``shared=True`` reads the shared tier instead, so a bump made by another
+    process is seen at once.
+    """
+    store = getattr(cache, 'shared', cache) if shared else cache
+    key = f'{name}:version'
+    version = store.get(key)
+    if version is None:
+        # Start from the clock so entries written under an evicted version are never reused
+        store.add(key, int(time.time() * 1000), None)
+        version = store.get(key, 0)
+    return version
+
+
+def bump_version(name):
+    try:
+        cache.incr(f'{name}:version')
+    except ValueError:
+        get_version(name)
@@ -0,0 +1,116 @@
+"""
+Resolve a job's process name (its first ``JobProcess`` step) to a cutting department.
+
+Resolution order, first hit wins:
+
+1. the saved ``ProcessDepartment`` mapping for the process name;
+2. a department whose name equals the process name (case-insensitive);
+3. the first department (by pk) whose name contains the process name with
+   its step prefix (``S1-``, ``2-`` ...) removed, starting at a word.
+
+The matcher answers all three from dictionaries: step 3 uses an index of
+the prefixes of every department name from each of its words on, so
+``line`` and ``slitting li`` both find "Slitting Line". It is built from
+the cached department list and kept until a Department or
+ProcessDepartment is saved or deleted, so resolving costs no query.
+
+Saving a job step (``remember=True``) records a step-3 match as a mapping,
+so the process keeps resolving to the same department when departments are
+added later. Lookups for the APIs never write.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+
+from . import reference
+from .models import Department, ProcessDepartment
+
+STEP_PREFIX = re.compile(r'^[sS]?\d+-?')
+# Where a word of a (normalized) department name starts
+_WORD = re.compile(r'(?:^|(?<=[\s\-/(]))\S')
+
+
+def normalize(name):
+    return ' '.join(name.split()).casefold()
+
+
+def _word_prefixes(name):
+    """Prefixes of the normalized ``name`` starting at each of its words."""
+    for word in _WORD.finditer(name):
+        rest = name[word.start():]
+        for end in range(1, len(rest) + 1):
+            yield rest[:end]
+
+
+class DepartmentMatcher:
+    def __init__(self, departments, mappings):
+        """``departments``: (pk, name) pairs in pk order; ``mappings``: (process_name, pk) pairs."""
+        self.mappings = {normalize(process): pk for process, pk in mappings}
+        self.by_name = {}
+        self.by_prefix = {}
+        for pk, name in departments:
+            name = normalize(name)
+            self.by_name.setdefault(name, pk)
+            for prefix in _word_prefixes(name):
+                self.by_prefix.setdefault(prefix, pk)
+
+    def resolve(self, process_name):
+        """Return ``(department_id, exact)``; ``exact`` is False for a substring match."""
+        name = normalize(process_name)
+        if not name:
+            return None, True
+        if name in self.mappings:
+            return self.mappings[name], True
+        if name in self.by_name:
+            return self.by_name[name], True
+        cleaned = normalize(STEP_PREFIX.sub('', name))
+        if cleaned in self.by_prefix:
+            return self.by_prefix[cleaned], False
+        return None, True
+
+
+_matcher = None
+_matcher_versions = None
+
+
+def get_matcher():
+    """The process-wide matcher, rebuilt when departments or mappings change."""
+    global _matcher, _matcher_versions
+    versions = (reference.version(Department), reference.version(ProcessDepartment))
+    if _matcher is None or versions != _matcher_versions:
+        _matcher = DepartmentMatcher(
+            reference.choices(Department),
+            ProcessDepartment.objects.values_list('process_name', 'department_id'),
+        )
+        _matcher_versions = versions
+    return _matcher
+
+
+def process_pattern(department_name):
+    """
+    Case-insensitive regex for the process names a department called
+    ``department_name`` can resolve: its name, or a prefix of it starting at
+    a word behind an optional step prefix. None for a blank name.
+    """
+    alternatives = {
+        r'\s+'.join(map(re.escape, prefix.split()))
+        for prefix in _word_prefixes(normalize(department_name)) if not prefix.endswith(' ')
+    }
+    if not alternatives:
+        return None
+    return r'^\s*(?:[sS]?\d+-?)?\s*(?:' + '|'.join(sorted(alternatives, key=len, reverse=True)) + r')\s*$'
+
+
+def resolve_department(process_name, remember=False):
+    """Department id for a job's process name, or None; ``remember`` saves a word match."""
+    department_id, exact = get_matcher().resolve(process_name)
+    if remember and department_id is not None and not exact:
+        mapping = ProcessDepartment(process_name=normalize(process_name)[:255], department_id=department_id)
+        # Records the matcher's own answer, so no job step needs requeueing
+        mapping.recorded_match = True
+        try:
+            with transaction.atomic():
+                mapping.save()
+        except IntegrityError:
+            pass  # recorded by another request meanwhile
+    return department_id
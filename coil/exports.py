@@ -0,0 +1,138 @@
+"""
+Streaming export engine shared by the SKU, pallet and coil export views.
+
+Rows are read with ``QuerySet.iterator()`` and written out one at a time, so
+memory use stays flat no matter how many rows the table holds:
+
+- CSV is generated lazily and sent through ``StreamingHttpResponse``.
+- XLSX uses an openpyxl write-only workbook, which spills rows to a temporary
+  file instead of keeping cell objects in memory. The finished file is then
+  streamed back with ``FileResponse``. A zip archive is only complete once
+  every row is written, so memory stays bounded but the first byte goes out
+  only after the whole file is built.
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+
+# Number of rows fetched from the database per round trip.
+CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """File-like object that hands back each written line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class Export:
+    """
+    Describes one export: the file name, the sheet title and the columns.
+
+    ``columns`` is a list of ``(header, getter)`` pairs where ``getter`` takes
+    a model instance and returns the cell value.
+    """
+
+    def __init__(self, filename, sheet_title, columns):
+        self.filename = filename
+        self.sheet_title = sheet_title
+        self.columns = columns
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def rows(self, queryset):
+        getters = [getter for _, getter in self.columns]
+        for obj in queryset.iterator(chunk_size=CHUNK_SIZE):
+            yield [getter(obj) for getter in getters]
+
+    def csv_response(self, queryset):
+        """Stream the queryset as a UTF-8 CSV file (Google Sheets compatible)."""
+        writer = csv.writer(Echo())
+
+        def generate():
+            # BOM so Excel opens the file as UTF-8
+            yield '\ufeff'
+            yield writer.writerow(self.headers)
+            for row in self.rows(queryset):
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(generate(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename={self.filename}.csv'
+        return response
+
+    def xlsx_response(self, queryset):
+        """Write the queryset to a write-only workbook and stream the file back."""
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(self.sheet_title)
+
+        header_cells = []
+        for header in self.headers:
+            cell = WriteOnlyCell(worksheet, value=header)
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal='center')
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+
+        for row in self.rows(queryset):
+            worksheet.append(row)
+
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
+
+        # FileResponse closes (and so deletes) the temporary file when done
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{self.filename}.xlsx',
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
+
+def _coilin_value(attr):
+    """Getter for a field on the pallet's CoilIn, blank when missing."""
+    def getter(pallet):
+        value = getattr(pallet.coilin, attr, None) if pallet.coilin else None
+        return str(value) if value else ''
+    return getter
+
+
+SKU_EXPORT = Export('SKU_Export', 'SKU', [
+    ('Type0', lambda sku: sku.Type0),
+    ('Type1', lambda sku: sku.Type1),
+    ('Type2', lambda sku: sku.Type2),
+    ('Thickness', lambda sku: sku.thickness),
+    ('Width', lambda sku: sku.width),
+    ('Length', lambda sku: sku.length),
+    ('Color', lambda sku: sku.color),
+    ('Grade', lambda sku: sku.grade),
+    ('Manufacturer', lambda sku: str(sku.manufacturer)),
+    ('Note1', lambda sku: sku.note1),
+    ('Note2', lambda sku: sku.note2),
+])
+
+COILPALLET_EXPORT = Export('CoilPallet_Export', 'CoilPallet', [
+    ('Pallet Number', lambda pallet: pallet.number),
+    ('Lot', lambda pallet: pallet.coilin.lot if pallet.coilin else ''),
+    ('SKU', lambda pallet: str(pallet.type0)),
+    ('Supplier', _coilin_value('supplier')),
+    ('Owner', _coilin_value('owner')),
+    ('Timestamp', _coilin_value('timestamp1')),
+])
+
+COILNUMBER_EXPORT = Export('CoilNumber_Export', 'CoilNumber', [
+    ('Coil Number', lambda coil: coil.number),
+    ('Weight (kg)', lambda coil: coil.weight),
+    ('Pallet Number', lambda coil: coil.coilpallet.number if coil.coilpallet else ''),
+    ('Lot', lambda coil: coil.coilpallet.coilin.lot if coil.coilpallet and coil.coilpallet.coilin else ''),
+    ('SKU', lambda coil: str(coil.coilpallet.type0) if coil.coilpallet and coil.coilpallet.type0 else ''),
+])
@@ -0,0 +1,115 @@
+"""
+Queryset builders shared by the list views and their export endpoints.
+
+Each function takes the request's GET parameters and returns the filtered,
+ordered queryset, so an export contains exactly the rows shown on screen.
+"""
+from django.db.models import Q
+
+from .models import DIMENSION_FIELDS, SKU, CoilPallet, CoilNumber, parse_dimension
+
+RANGE_LOOKUPS = ('gte', 'gt', 'lte', 'lt')
+
+
+def prefix_q(field, term):
+    """
+    Prefix match written as a range (``field >= term AND field < term + U+FFFF``).
+
+    Unlike ``LIKE 'term%'`` this is answered straight from a plain B-tree
+    index on SQLite. The match is case-sensitive.
+    """
+    return Q(**{f'{field}__gte': term, f'{field}__lt': term + '\uffff'})
+
+
+def dimension_filter(queryset, params, name):
+    """
+    Filter on the parsed column of a SKU dimension (``thickness``, ``width``
+    or ``length``): ``?thickness=1.6`` is exact, ``?thickness=1.2-2.0`` an
+    inclusive range, and ``thickness__gte``/``__gt``/``__lte``/``__lt`` are
+    bounds. A value with no number in it (``C``) matches the text instead.
+    """
+    column = DIMENSION_FIELDS[name]
+    value = (params.get(name) or '').strip()
+    if value:
+        low, dash, high = value.partition('-')
+        low, high = parse_dimension(low), parse_dimension(high)
+        if dash and low is not None and high is not None:
+            queryset = queryset.filter(**{f'{column}__range': (low, high)})
+        elif not dash and low is not None:
+            queryset = queryset.filter(**{column: low})
+        else:
+            queryset = queryset.filter(**{f'{name}__icontains': value})
+
+    for lookup in RANGE_LOOKUPS:
+        bound = parse_dimension(params.get(f'{name}__{lookup}'))
+        if bound is not None:
+            queryset = queryset.filter(**{f'{column}__{lookup}': bound})
+    return queryset
+
+
+def sku_queryset(params):
+    queryset = SKU.objects.select_related('manufacturer').order_by('Type0', 'Type1')
+
+    q = params.get('q')
+    type0 = params.get('type0')
+
+    if q:
+        queryset = queryset.filter(
+            Q(Type0__icontains=q) |
+            Q(Type1__icontains=q) |
+            Q(note1__icontains=q) |
+            Q(grade__icontains=q)
+        )
+
+    if type0:
+        queryset = queryset.filter(Type0__icontains=type0)
+
+    for name in DIMENSION_FIELDS:
+        queryset = dimension_filter(queryset, params, name)
+
+    return queryset
+
+
+def coilpallet_queryset(params):
+    queryset = CoilPallet.objects.select_related(
+        'coilin', 'coilin__supplier', 'coilin__owner', 'type0'
+    ).order_by('-coilin__timestamp1')
+
+    q = params.get('q')  # General search (Lot, Pallet Number)
+    sku = params.get('sku')
+    sku_id = params.get('sku_id')
+
+    if q:
+        queryset = queryset.filter(
+            Q(number__icontains=q) |
+            Q(coilin__lot__icontains=q)
+        )
+
+    if sku:
+        queryset = queryset.filter(
+            Q(type0__Type0__icontains=sku) |
+            Q(type0__thickness__icontains=sku) |
+            Q(type0__width__icontains=sku)
+        )
+
+    if sku_id and sku_id.isdigit():
+        queryset = queryset.filter(type0_id=sku_id)
+
+    return queryset
+
+
+def coilnumber_queryset(params):
+    queryset = CoilNumber.objects.select_related(
+        'coilpallet', 'coilpallet__coilin', 'coilpallet__type0'
+    ).order_by('coilpallet__number', 'number')
+
+    q = params.get('q')  # General search (Coil Number, Pallet Number, Lot)
+
+    if q:
+        queryset = queryset.filter(
+            Q(number__icontains=q) |
+            Q(coilpallet__number__icontains=q) |
+            Q(coilpallet__coilin__lot__icontains=q)
+        )
+
+    return queryset
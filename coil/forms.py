@@ -1,11 +1,39 @@
 from django import forms
 from django.forms import inlineformset_factory
-from .models import CoilIn, CoilPallet, CoilNumber, SKU, CoilOut, Job
+from django.urls import reverse_lazy
+from .models import CoilIn, CoilPallet, CoilNumber, SKU, CoilOut, Job, JobProcess
+from .reference import CachedModelChoiceField
+
+class AutocompleteSelect(forms.Select):
+    """
+    Select for large tables that renders only the selected option.
+
+    The remaining options are loaded on demand by Select2 from the JSON
+    endpoint named by ``url`` (see the autocomplete views), so the page no
+    longer embeds the whole table.
+    """
+    def __init__(self, url, attrs=None):
+        attrs = {**(attrs or {}), 'data-autocomplete-url': reverse_lazy(url)}
+        super().__init__(attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        selected = [v for v in value if str(v).isdigit()]
+        choices = [('', iterator.field.empty_label or '')]
+        if selected:
+            choices += [iterator.choice(obj) for obj in iterator.queryset.filter(pk__in=selected)]
+
+        self.choices = choices
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
 
 class CoilInForm(forms.ModelForm):
     class Meta:
         model = CoilIn
         fields = ['timestamp1', 'lot', 'supplier', 'owner']
+        field_classes = {'supplier': CachedModelChoiceField, 'owner': CachedModelChoiceField}
         widgets = {
              'timestamp1': forms.DateTimeInput(attrs={
                  'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50 datetimepicker',
@@ -26,6 +54,7 @@ class CoilPalletForm(forms.ModelForm):
     class Meta:
         model = CoilPallet
         fields = ['number', 'type0']
+        field_classes = {'type0': CachedModelChoiceField}
         widgets = {
             'number': forms.TextInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'}),
             'type0': forms.Select(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'}),
@@ -58,7 +87,7 @@ class CoilOutForm(forms.ModelForm):
         queryset=Job.objects.all(),
         label='เลขงาน',
         required=False,
-        widget=forms.Select(attrs={
+        widget=AutocompleteSelect('coil:autocomplete_jobs', attrs={
             'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'
         })
     )
@@ -84,15 +113,16 @@ class CoilOutForm(forms.ModelForm):
             'full_coil_partial', 'coil_kg', 'type0',
             'department_cutting', 'note_1'
         ]
+        field_classes = {'department_cutting': CachedModelChoiceField}
         widgets = {
             'timestamp1': forms.DateTimeInput(attrs={
                 'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50 datetimepicker',
                 'placeholder': 'YYYY-MM-DD HH:MM'
             }, format='%Y-%m-%d %H:%M'),
-            'coil_number': forms.Select(attrs={
+            'coil_number': AutocompleteSelect('coil:autocomplete_coil_numbers', attrs={
                 'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'
             }),
-            'sku': forms.Select(attrs={
+            'sku': AutocompleteSelect('coil:autocomplete_skus', attrs={
                 'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'
             }),
             'full_coil_partial': forms.Select(choices=[
@@ -127,6 +157,14 @@ class CoilOutForm(forms.ModelForm):
             'note_1': 'หมายเหตุ',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only offer coils that are still in stock, plus the current one when editing
+        coils = CoilNumber.objects.available()
+        if self.instance.coil_number_id:
+            coils = coils | CoilNumber.objects.filter(pk=self.instance.coil_number_id)
+        self.fields['coil_number'].queryset = coils
+
     def save(self, commit=True):
         instance = super(CoilOutForm, self).save(commit=False)
         # Use the selected Job instance directly
@@ -151,36 +189,48 @@ class JobForm(forms.ModelForm):
                 'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50',
                 'type': 'date'
             }),
-            'job_process_1_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_2_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_3_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_4_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_5_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_6_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_7_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_8_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_9_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_10_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_11_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_12_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_13_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_14_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_15_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_16_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_17_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_18_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_19_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            'job_process_20_duefin': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
-            # Add other fields as needed, keeping generic style for now
         }
         labels = {
             'date_job': 'วัน เดือน ปี',
         }
 
+class JobProcessForm(forms.ModelForm):
+    class Meta:
+        model = JobProcess
+        fields = ['process', 'due_date', 'is_done']
+        widgets = {
+            'process': forms.TextInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'}),
+            'due_date': forms.DateInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50', 'type': 'date'}),
+        }
+
+class BaseJobProcessFormSet(forms.BaseInlineFormSet):
+    def save(self, commit=True):
+        """Save the steps numbered 1..n in the order of the rows"""
+        super().save(commit=False)
+        for obj in self.deleted_objects:
+            obj.delete()
+
+        kept = [
+            form.instance for form in self.forms
+            if form not in self.deleted_forms and (form.instance.pk or form.has_changed())
+        ]
+        # Remaining rows only move to lower steps, so (job, step) stays unique on the way
+        for step, process in enumerate(kept, 1):
+            process.job = self.instance
+            process.step = step
+            process.save()
+        return kept
+
+JobProcessFormSet = inlineformset_factory(
+    Job, JobProcess, form=JobProcessForm, formset=BaseJobProcessFormSet,
+    extra=3, can_delete=True, max_num=JobProcess.MAX_STEPS, validate_max=True
+)
+
 class SKUForm(forms.ModelForm):
     class Meta:
         model = SKU
         fields = '__all__'
+        field_classes = {'manufacturer': CachedModelChoiceField}
         widgets = {
             'Type0': forms.TextInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'}),
             'Type1': forms.TextInput(attrs={'class': 'mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-300 focus:ring focus:ring-indigo-200 focus:ring-opacity-50'}),
@@ -0,0 +1,244 @@
+"""
+Request instrumentation for the coil app.
+
+``RequestTimingMiddleware`` times every request, counts the SQL queries it
+runs and their total time, and feeds per-view latency histograms. Each
+request gets an id (taken from ``X-Request-ID`` when the proxy sends one)
+that ``RequestIdFilter`` adds to every log record written while it runs,
+so log lines of one request can be grouped. Queries run while a streamed
+response (CSV exports, the batch label page) is being consumed count
+towards its request, which is observed once the stream ends; the
+``Server-Timing`` header has to go out first and covers the view only.
+``JsonFormatter`` writes log
+records, including their ``extra`` fields, as one JSON object per line.
+
+It runs only with ``COIL_INSTRUMENTATION = True`` (the production
+settings); otherwise the middleware removes itself from the stack when the
+server starts and requests pay nothing for it.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('coil.requests')
+
+request_id_var = contextvars.ContextVar('coil_request_id', default='-')
+
+# Upper bounds of the latency buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook counting queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start)
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.query_ms = 0.0
+
+    def observe(self, duration_ms, queries, query_ms):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.queries += queries
+        self.query_ms += query_ms
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of requests."""
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return None
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'max_ms': round(self.max_ms, 2),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'queries_per_request': round(self.queries / self.count, 2) if self.count else None,
+            'query_ms_per_request': round(self.query_ms / self.count, 2) if self.count else None,
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.counts)
+            },
+        }
+
+
+class ViewMetrics:
+    """Latency histograms per view (URL name), shared by the threads of a worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, view, duration_ms, queries, query_ms):
+        with self._lock:
+            histogram = self._histograms.get(view)
+            if histogram is None:
+                histogram = self._histograms[view] = LatencyHistogram()
+            histogram.observe(duration_ms, queries, query_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {view: histogram.as_dict() for view, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+view_metrics = ViewMetrics()
+
+
+def record_queries(recorder):
+    """Context manager installing ``recorder`` on every database connection."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+def record_streaming(response, recorder, finish):
+    """
+    Keep ``recorder`` installed while the body of a streaming response is
+    produced, and call ``finish()`` once it is exhausted or closed.
+    """
+    content = iter(response.streaming_content)
+
+    def generate():
+        try:
+            while True:
+                with record_queries(recorder):
+                    chunk = next(content, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            finish()
+
+    response.streaming_content = generate()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'COIL_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'COIL_SLOW_REQUEST_MS', 1000)
+
+    def __call__(self, request):
+        request.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        token = request_id_var.set(request.request_id)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        try:
+            with record_queries(recorder):
+                response = self.get_response(request)
+            duration_ms = (time.perf_counter() - start) * 1000
+            response['X-Request-ID'] = request.request_id
+            response['Server-Timing'] = (
+                f'app;dur={duration_ms:.1f}, '
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+            )
+            if response.streaming and not response.is_async:
+                record_streaming(response, recorder, lambda: self.finish(request, response, recorder, start))
+            else:
+                self.finish(request, response, recorder, start)
+            return response
+        finally:
+            request_id_var.reset(token)
+
+    def finish(self, request, response, recorder, start):
+        duration_ms = (time.perf_counter() - start) * 1000
+        query_ms = recorder.duration * 1000
+        view = view_name(request)
+        view_metrics.observe(view, duration_ms, recorder.count, query_ms)
+
+        level = logging.WARNING if duration_ms >= self.slow_ms else logging.DEBUG
+        if logger.isEnabledFor(level):
+            # A stream ends after __call__ has returned and reset the id
+            token = request_id_var.set(request.request_id)
+            try:
+                logger.log(
+                    level, '%s %s %s %.1fms %d queries %.1fms',
+                    request.method, request.path, response.status_code,
+                    duration_ms, recorder.count, query_ms,
+                    extra={
+                        'view': view,
+                        'status': response.status_code,
+                        'duration_ms': round(duration_ms, 2),
+                        'queries': recorder.count,
+                        'query_ms': round(query_ms, 2),
+                    },
+                )
+            finally:
+                request_id_var.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds ``request_id`` to every record (``-`` outside a request)."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
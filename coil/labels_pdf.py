@@ -0,0 +1,240 @@
+"""
+Server-side PDF rendering of pallet labels with reportlab.
+
+Each pallet is rendered to its own one-page PDF. Pages are cached under a
+hash of everything printed on the label (pallet, lot and coil rows), so a
+reprint of an unchanged pallet is served straight from the cache, and any
+edit to the pallet or its coils produces a new key. Large batches are
+rendered in a process pool, started on first use and kept for the life of
+the worker process; the pages are then merged into one document. Pages
+are kept in the shared cache tier only: they are tens of kilobytes each and
+would crowd everything else out of the per-process tier.
+
+Labels print Thai lot, supplier and SKU text, so ``LABEL_PDF_FONT`` must
+name a TrueType font with Thai glyphs (e.g. Sarabun); the built-in PDF
+fonts have none. Without it the PDF views are switched off
+(``is_available()``) and the label list hides their buttons.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from pypdf import PdfWriter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+# Bump when the layout changes so cached pages are not reused.
+RENDERER_VERSION = 2
+CACHE_PREFIX = 'label-pdf'
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Batches with fewer pages than this render in the request process.
+POOL_THRESHOLD = 20
+
+LABEL_GREEN = colors.HexColor('#d8f0d8')
+LABEL_MAGENTA = colors.HexColor('#e91e8c')
+MIN_COIL_ROWS = 6
+
+FONT_NAME = 'LabelFont'
+
+
+def font_path():
+    """The configured label font; raises ImproperlyConfigured when it is missing."""
+    path = settings.LABEL_PDF_FONT
+    if not path:
+        raise ImproperlyConfigured('Set LABEL_PDF_FONT to a TrueType font with Thai glyphs to render label PDFs.')
+    if not os.path.isfile(path):
+        raise ImproperlyConfigured(f'LABEL_PDF_FONT {path} does not exist.')
+    return path
+
+
+def is_available():
+    """Whether a label font is configured, i.e. the PDF views can render."""
+    try:
+        font_path()
+    except ImproperlyConfigured:
+        return False
+    return True
+
+
+def _page_cache():
+    # The shared tier behind coil.cache.TieredCache, or the cache itself
+    return getattr(cache, 'shared', cache)
+
+
+def _font(font_path):
+    """Register the label font once per process."""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+    return FONT_NAME
+
+
+def _number(value):
+    return f'{value:g}' if isinstance(value, float) else ('' if value is None else str(value))
+
+
+def label_data(pallet):
+    """
+    Plain, picklable description of one label.
+
+    ``pallet`` must come from ``CoilPallet.objects.for_labels()``.
+    """
+    coilin = pallet.coilin
+    sku = pallet.type0
+    return {
+        'pallet_id': pallet.pk,
+        'heading': f'{coilin.lot or ""}-{coilin.supplier.name or ""}-{coilin.owner.name or ""}',
+        'number': pallet.number,
+        'dimensions': f'{sku.thickness} x {sku.width}',
+        'grade': sku.grade,
+        'color': sku.color,
+        'date_in': f'{coilin.timestamp2.day}/{coilin.timestamp2.month}/{coilin.timestamp2.year}',
+        'total_count': pallet.total_count,
+        'total_weight': pallet.total_weight,
+        'coils': [[c.number, c.weight] for c in pallet.all_coils],
+    }
+
+
+def cache_key(data):
+    payload = json.dumps([RENDERER_VERSION, data], sort_keys=True, ensure_ascii=False)
+    return f'{CACHE_PREFIX}:{hashlib.sha256(payload.encode("utf-8")).hexdigest()}'
+
+
+def render_label(data, font_path):
+    """Render one label to PDF bytes. Runs in worker processes, so no ORM access."""
+    font = _font(font_path)
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(
+        output, pagesize=landscape(A4),
+        leftMargin=10 * mm, rightMargin=10 * mm, topMargin=10 * mm, bottomMargin=10 * mm,
+        title=f'Label {data["number"]}',
+    )
+
+    left = Table([
+        [data['heading'], data['number']],
+        [data['dimensions'], ''],
+        ['เกรด', 'สี'],
+        [data['grade'], data['color']],
+        ['', ''],
+        ['', ''],
+        ['รวม', f'{data["total_count"]} ม้วน'],
+        ['น้ำหนัก', f'{_number(data["total_weight"])} kg'],
+    ], colWidths=[82 * mm, 54 * mm], rowHeights=[12 * mm, 24 * mm] + [12 * mm] * 6)
+    left.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), font, 14),
+        ('FONT', (0, 0), (0, 0), font, 16),
+        ('FONT', (1, 0), (1, 0), font, 20),
+        ('TEXTCOLOR', (1, 0), (1, 0), LABEL_MAGENTA),
+        ('SPAN', (0, 1), (1, 1)),
+        ('FONT', (0, 1), (1, 1), font, 28),
+        ('ALIGN', (0, 1), (1, 1), 'CENTER'),
+        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+        ('ALIGN', (1, 2), (1, 3), 'CENTER'),
+        ('ALIGN', (1, 6), (1, 7), 'RIGHT'),
+    ]))
+
+    coil_rows = [[number, _number(weight), 'kg', ''] for number, weight in data['coils']]
+    if len(coil_rows) < MIN_COIL_ROWS:
+        coil_rows += [['', '', '', '']] * 4
+    right = Table(
+        [['เหล็กเข้า', '', ':', data['date_in']], ['C#', 'NW', '', 'Note']] + coil_rows,
+        colWidths=[22 * mm, 30 * mm, 14 * mm, 70 * mm],
+    )
+    right.setStyle(TableStyle([
+        ('FONT', (0, 0), (-1, -1), font, 12),
+        ('SPAN', (0, 0), (1, 0)),
+        ('ALIGN', (3, 0), (3, 0), 'RIGHT'),
+        ('ALIGN', (0, 1), (2, -1), 'CENTER'),
+        ('ALIGN', (1, 2), (1, -1), 'RIGHT'),
+    ]))
+
+    for table in (left, right):
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), LABEL_GREEN),
+            ('GRID', (0, 0), (-1, -1), 1.5, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+
+    layout = Table([[left, right]], colWidths=[138 * mm, 138 * mm])
+    layout.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ]))
+    doc.build([layout])
+    return output.getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(reset=False):
+    """This process's render pool; starting workers costs more than most batches take to render."""
+    global _pool
+    with _pool_lock:
+        if reset and _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.LABEL_PDF_WORKERS)
+        return _pool
+
+
+def _render_many(datas, font_path):
+    if len(datas) < POOL_THRESHOLD or settings.LABEL_PDF_WORKERS <= 1:
+        return [render_label(data, font_path) for data in datas]
+    try:
+        return list(_get_pool().map(render_label, datas, repeat(font_path), chunksize=8))
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); retry once on a fresh pool
+        return list(_get_pool(reset=True).map(render_label, datas, repeat(font_path), chunksize=8))
+
+
+def _merge(pages):
+    if len(pages) == 1:
+        return pages[0]
+    writer = PdfWriter()
+    for page in pages:
+        writer.append(io.BytesIO(page))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_pallets(pallets):
+    """
+    Render the given pallets (from ``for_labels()``) into one PDF document,
+    reusing cached pages and rendering only the ones that changed.
+    """
+    path = font_path()
+    datas = [label_data(pallet) for pallet in pallets]
+    if not datas:
+        return None
+
+    keys = [cache_key(data) for data in datas]
+    page_cache = _page_cache()
+    pages = page_cache.get_many(keys)
+
+    missing = [(key, data) for key, data in zip(keys, datas) if key not in pages]
+    if missing:
+        rendered = dict(zip(
+            [key for key, _ in missing],
+            _render_many([data for _, data in missing], path),
+        ))
+        page_cache.set_many(rendered, CACHE_TIMEOUT)
+        pages.update(rendered)
+
+    return _merge([pages[key] for key in keys])
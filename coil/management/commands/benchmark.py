@@ -0,0 +1,242 @@
+"""
+Time every list view, export, JSON API and form page against synthetic data.
+
+    python manage.py benchmark --scale 100k --repeat 5 --output results.json
+    python manage.py benchmark --scale 100k --keepdb --compare results.json
+
+The data lives in its own SQLite file (``--database``), created from the
+migrations like a test database. With ``--keepdb`` it is kept and reused by
+the next run at the same scale, which saves regenerating 1M coils.
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from coil import labels_pdf, synthetic
+from coil.instrumentation import QueryRecorder
+from coil.models import CoilIn, CoilNumber, CoilOut, CoilPallet, Job
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# The configured cache tiers with the shared tier in memory: the synthetic
+# reference lists and group names must not reach the app's real cache
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'coil.cache.TieredCache', 'OPTIONS': {'SHARED': 'shared'}},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'coil-benchmark'},
+}
+
+
+def _scale(value):
+    value = value.lower()
+    if value in SCALES:
+        return SCALES[value]
+    if value.isdigit():
+        return int(value)
+    raise CommandError(f'Unknown scale {value!r}; use {", ".join(SCALES)} or a number of coils')
+
+
+def _targets():
+    """(name, kind, url) for every page measured, built from ids in the data."""
+    coilin = CoilIn.objects.order_by('pk').first()
+    pallet = CoilPallet.objects.filter(coilin=coilin).order_by('pk').first()
+    coil = CoilNumber.objects.order_by('pk').first()
+    coilout = CoilOut.objects.order_by('pk').first()
+    job = Job.objects.order_by('pk').first()
+    coil_ids = ','.join(map(str, CoilNumber.objects.order_by('pk').values_list('pk', flat=True)[:50]))
+    job_ids = ','.join(map(str, Job.objects.order_by('pk').values_list('pk', flat=True)[:50]))
+
+    def url(name, *args, query=''):
+        return reverse(f'coil:{name}', args=args) + (f'?{query}' if query else '')
+
+    return [
+        ('coilin_list', 'list', url('coilin_list')),
+        ('coilout_list', 'list', url('coilout_list')),
+        ('label_list', 'list', url('label_list')),
+        ('job_list', 'list', url('job_list')),
+        ('schedule_board', 'list', url('schedule_board')),
+        ('sku_list', 'list', url('sku_list')),
+        ('coilpallet_list', 'list', url('coilpallet_list')),
+        ('coilnumber_list', 'list', url('coilnumber_list')),
+        ('coilin_detail', 'detail', url('coilin_detail', coilin.pk)),
+        ('coilout_detail', 'detail', url('coilout_detail', coilout.pk)),
+        ('print_labels', 'detail', url('print_labels', coilin.pk)),
+        ('print_labels_batch', 'detail', url('print_labels_batch', query=f'ids={coilin.pk}')),
+        ('print_labels_pdf', 'detail', url('print_labels_pdf', coilin.pk)),
+        ('pallet_label_pdf', 'detail', url('pallet_label_pdf', pallet.pk)),
+        ('index', 'form', url('index')),
+        ('coilin_create', 'form', url('coilin_create')),
+        ('add_pallet', 'form', url('add_pallet', coilin.pk)),
+        ('coilout_create', 'form', url('coilout_create')),
+        ('coilout_update', 'form', url('coilout_update', coilout.pk)),
+        ('job_create', 'form', url('job_create')),
+        ('get_coil_sku', 'api', url('get_coil_sku', coil.pk)),
+        ('get_job_details', 'api', url('get_job_details', job.pk)),
+        ('coil_details_batch', 'api', url('coil_details_batch', query=f'ids={coil_ids}')),
+        ('job_details_batch', 'api', url('job_details_batch', query=f'ids={job_ids}')),
+        ('autocomplete_coil_numbers', 'api', url('autocomplete_coil_numbers', query='q=K-00')),
+        ('autocomplete_skus', 'api', url('autocomplete_skus', query='q=เหล็ก')),
+        ('autocomplete_jobs', 'api', url('autocomplete_jobs', query='q=J00')),
+        ('search', 'list', url('search', query='q=K-00001')),
+        ('search_json', 'api', url('search_json', query='q=เหล็ก')),
+        ('search_json_trigram', 'api', url('search_json', query='q=แผ่น 1.6')),
+        ('export_sku_csv', 'export', url('export_sku_csv')),
+        ('export_sku_excel', 'export', url('export_sku_excel')),
+        ('export_coilpallet_csv', 'export', url('export_coilpallet_csv')),
+        ('export_coilpallet_excel', 'export', url('export_coilpallet_excel')),
+        ('export_coilnumber_csv', 'export', url('export_coilnumber_csv')),
+        ('export_coilnumber_excel', 'export', url('export_coilnumber_excel')),
+    ]
+
+
+def _fetch(client, url):
+    response = client.get(url)
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return response.status_code, len(body)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the coil views, exports, APIs and forms on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or a number of coils')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per page')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only pages whose name or kind contains this (repeatable)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Earlier results file to compare medians with')
+        parser.add_argument('--database', default=str(settings.BASE_DIR / 'benchmark.sqlite3'),
+                            help='SQLite file holding the synthetic data')
+        parser.add_argument('--keepdb', action='store_true', help='Keep and reuse the benchmark database')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        coils = _scale(options['scale'])
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        if connection.vendor != 'sqlite':
+            raise CommandError('The benchmark creates its own SQLite database; run it with SQLite settings.')
+
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            results = self._benchmark(coils, options)
+
+        report = {
+            'meta': {
+                'scale': options['scale'],
+                'coils': coils,
+                'repeat': options['repeat'],
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': connection.Database.sqlite_version,
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+        if options['compare']:
+            self._compare(options['compare'], results)
+
+    def _benchmark(self, coils, options):
+        connection.settings_dict['TEST']['NAME'] = options['database']
+        database = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            existing = CoilNumber.objects.count()
+            if existing and existing != coils:
+                raise CommandError(f'{database} holds {existing} coils; drop --keepdb or pick another --database')
+            if not existing:
+                self.stdout.write(f'Generating {coils} coils in {database} ...')
+                started = time.perf_counter()
+                counts = synthetic.generate(coils, seed=options['seed'], progress=self._progress)
+                self.stdout.write(f'\nGenerated {counts} in {time.perf_counter() - started:.1f}s')
+            return self._run(options)
+        finally:
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(database, verbosity=0)
+
+    def _progress(self, counts):
+        self.stdout.write(f'\r  {counts["coils"]} coils', ending='')
+        self.stdout.flush()
+
+    def _run(self, options):
+        from django.contrib.auth.models import User
+
+        # Start cold; this is the in-memory cache set up in handle()
+        cache.clear()
+        client = Client()
+        client.force_login(User.objects.get(username='benchmark'))
+
+        results = []
+        for name, kind, url in _targets():
+            if options['only'] and not any(part in name or part == kind for part in options['only']):
+                continue
+            if name.endswith('_pdf') and not labels_pdf.is_available():
+                self.stdout.write(self.style.WARNING(f'{name:<28} skipped: LABEL_PDF_FONT is not set'))
+                continue
+            # The first run warms the caches and is not timed
+            status, size = _fetch(client, url)
+            times = []
+            for _ in range(options['repeat']):
+                recorder = QueryRecorder()
+                started = time.perf_counter()
+                with connection.execute_wrapper(recorder):
+                    _fetch(client, url)
+                times.append((time.perf_counter() - started) * 1000)
+
+            result = {
+                'name': name,
+                'kind': kind,
+                'url': url,
+                'status': status,
+                'bytes': size,
+                'queries': recorder.count,
+                'query_ms': round(recorder.duration * 1000, 2),
+                'min_ms': round(min(times), 2),
+                'median_ms': round(statistics.median(times), 2),
+                'mean_ms': round(statistics.mean(times), 2),
+                'max_ms': round(max(times), 2),
+            }
+            results.append(result)
+            self.stdout.write(
+                f'{name:<28} {kind:<7} {status} {result["queries"]:>4} queries '
+                f'{result["median_ms"]:>10.1f} ms  {size:>10} bytes'
+            )
+        return results
+
+    def _compare(self, path, results):
+        with open(path, encoding='utf-8') as f:
+            before = {result['name']: result for result in json.load(f)['results']}
+        self.stdout.write(f'\nCompared with {os.path.basename(path)} (median ms, queries):')
+        for result in results:
+            old = before.get(result['name'])
+            if old is None:
+                continue
+            change = (result['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0
+            line = (f'{result["name"]:<28} {old["median_ms"]:>10.1f} -> {result["median_ms"]:>10.1f} '
+                    f'({change:+.0f}%)  {old["queries"]:>4} -> {result["queries"]:>4}')
+            style = self.style.ERROR if change > 20 or result['queries'] > old['queries'] else self.style.SUCCESS
+            self.stdout.write(style(line))
@@ -0,0 +1,162 @@
+"""
+Concurrent write throughput of the configured SQLite settings against
+Django's defaults (rollback journal, ``synchronous=FULL``, deferred
+transactions).
+
+    python manage.py benchmark_writes --writers 8 --readers 4 --seconds 10
+
+Each profile gets a fresh database file. Writer threads run short
+transactions shaped like a coil-out save (read the coil, insert a row,
+update the coil) while reader threads keep scanning like the list pages.
+The report shows committed transactions per second, "database is locked"
+failures and commit latency.
+"""
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+SEED_ROWS = 20_000
+
+
+def _profiles(directory):
+    configured = settings.DATABASES['default']
+    if configured['ENGINE'] != 'django.db.backends.sqlite3':
+        raise CommandError('benchmark_writes measures the SQLite settings; DATABASES["default"] is not SQLite.')
+    return {
+        'django-defaults': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': directory / 'defaults.sqlite3'},
+        'configured': {**configured, 'NAME': directory / 'configured.sqlite3', 'TEST': {}},
+    }
+
+
+def _setup(alias):
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE coil (id INTEGER PRIMARY KEY, lot TEXT, weight REAL, status TEXT)'
+        )
+        cursor.execute('CREATE INDEX coil_lot ON coil (lot)')
+        cursor.execute('CREATE TABLE coilout (id INTEGER PRIMARY KEY, coil_id INTEGER, kg REAL, at REAL)')
+        cursor.executemany(
+            'INSERT INTO coil (lot, weight, status) VALUES (%s, %s, %s)',
+            [(f'K-{i // 20:05d}', 1000 + i % 500, 'available') for i in range(SEED_ROWS)],
+        )
+    connections[alias].close()
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.locked = 0
+        self.reads = 0
+
+
+def _writer(alias, stop, stats, seed):
+    coil_id = seed
+    try:
+        while time.perf_counter() < stop:
+            coil_id = coil_id * 7919 % SEED_ROWS + 1
+            started = time.perf_counter()
+            try:
+                with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT weight FROM coil WHERE id = %s', [coil_id])
+                    weight = cursor.fetchone()[0]
+                    cursor.execute('INSERT INTO coilout (coil_id, kg, at) VALUES (%s, %s, %s)',
+                                   [coil_id, weight / 4, time.time()])
+                    cursor.execute("UPDATE coil SET status = 'partial', weight = %s WHERE id = %s",
+                                   [weight * 3 / 4, coil_id])
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                with stats.lock:
+                    stats.locked += 1
+                continue
+            with stats.lock:
+                stats.latencies.append(time.perf_counter() - started)
+    finally:
+        connections[alias].close()
+
+
+def _reader(alias, stop, stats):
+    try:
+        while time.perf_counter() < stop:
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        'SELECT lot, COUNT(*), SUM(weight) FROM coil GROUP BY lot ORDER BY lot DESC LIMIT 50'
+                    )
+                    cursor.fetchall()
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                continue
+            with stats.lock:
+                stats.reads += 1
+    finally:
+        connections[alias].close()
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent SQLite write throughput of the configured settings with Django defaults'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Threads committing coil-out transactions')
+        parser.add_argument('--readers', type=int, default=4, help='Threads running list-page scans')
+        parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+
+    def handle(self, *args, **options):
+        if options['writers'] < 1:
+            raise CommandError('--writers must be at least 1')
+        directory = Path(tempfile.mkdtemp(prefix='coil-writes-'))
+        try:
+            results = {}
+            for name, profile in _profiles(directory).items():
+                alias = f'benchmark_writes_{name}'
+                # configure_settings() fills in the defaults and insists on a 'default' entry
+                databases = connections.configure_settings({DEFAULT_DB_ALIAS: {}, alias: profile})
+                connections.settings[alias] = databases[alias]
+                try:
+                    _setup(alias)
+                    results[name] = self._run(alias, options)
+                finally:
+                    del connections.settings[alias]
+                self._report(name, results[name], options['seconds'])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        before, after = results['django-defaults'], results['configured']
+        if before.latencies:
+            gain = len(after.latencies) / len(before.latencies)
+            self.stdout.write(self.style.SUCCESS(f'Write throughput: {gain:.1f}x Django defaults'))
+
+    def _run(self, alias, options):
+        stats = Stats()
+        stop = time.perf_counter() + options['seconds']
+        threads = [
+            threading.Thread(target=_writer, args=(alias, stop, stats, seed + 1))
+            for seed in range(options['writers'])
+        ] + [
+            threading.Thread(target=_reader, args=(alias, stop, stats))
+            for _ in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
+
+    def _report(self, name, stats, seconds):
+        commits = len(stats.latencies)
+        line = (f'{name:<16} {commits / seconds:>9.1f} commits/s  {stats.locked:>5} locked  '
+                f'{stats.reads / seconds:>9.1f} reads/s')
+        if commits:
+            latencies = sorted(stats.latencies)
+            p95 = latencies[int(len(latencies) * 0.95)]
+            line += f'  median {statistics.median(latencies) * 1000:.1f} ms  p95 {p95 * 1000:.1f} ms'
+        self.stdout.write(line)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from coil.models import SKU, CoilNumber, JobProcess
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized columns (SKU display names and dimensions, coil full paths, job step departments) for existing rows'
+
+    def handle(self, *args, **options):
+        changed = SKU.objects.all().refresh_display_names()
+        self.stdout.write(self.style.SUCCESS(f'SKU display names updated: {changed}'))
+
+        changed = SKU.objects.all().refresh_dimensions()
+        self.stdout.write(self.style.SUCCESS(f'SKU dimensions updated: {changed}'))
+
+        changed = CoilNumber.objects.all().refresh_full_paths()
+        self.stdout.write(self.style.SUCCESS(f'Coil full paths updated: {changed}'))
+
+        changed = JobProcess.objects.all().refresh_departments()
+        self.stdout.write(self.style.SUCCESS(f'Job step departments updated: {changed}'))
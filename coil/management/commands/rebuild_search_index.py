@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from coil import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index over SKUs, lots, pallets, coils and jobs'
+
+    def handle(self, *args, **options):
+        for kind, count in search.rebuild().items():
+            self.stdout.write(self.style.SUCCESS(f'Indexed {kind}: {count}'))
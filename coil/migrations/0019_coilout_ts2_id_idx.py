@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0018_job_job_process_10_duefin_job_job_process_11_duefin_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coilout',
+            index=models.Index(fields=['-timestamp2', '-id'], name='coilout_ts2_id_idx'),
+        ),
+    ]
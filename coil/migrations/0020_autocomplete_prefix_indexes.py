@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0019_coilout_ts2_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coilin',
+            name='lot',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='coilnumber',
+            name='number',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='job_number',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:55
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_availability(apps, schema_editor):
+    """Derive status and remaining_weight for existing coils from their coil-outs"""
+    CoilNumber = apps.get_model('coil', 'CoilNumber')
+    full = Q(coilout__full_coil_partial='เต็มม้วน')
+    coils = CoilNumber.objects.annotate(
+        out_count=Count('coilout'),
+        full_count=Count('coilout', filter=full),
+        cut_weight=Sum('coilout__coil_kg', filter=~full),
+    )
+
+    changed = []
+    for coil in coils.iterator(chunk_size=2000):
+        if coil.full_count:
+            coil.status, coil.remaining_weight = 'consumed', 0.0
+        elif coil.weight is None:
+            coil.status = 'partial' if coil.out_count else 'available'
+            coil.remaining_weight = None
+        else:
+            coil.remaining_weight = max(coil.weight - (coil.cut_weight or 0), 0.0)
+            if not coil.out_count:
+                coil.status = 'available'
+            elif coil.remaining_weight > 0:
+                coil.status = 'partial'
+            else:
+                coil.status = 'consumed'
+        changed.append(coil)
+
+    CoilNumber.objects.bulk_update(changed, ['status', 'remaining_weight'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0020_autocomplete_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coilnumber',
+            name='remaining_weight',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='coilnumber',
+            name='status',
+            field=models.CharField(choices=[('available', 'พร้อมใช้'), ('partial', 'ตัดไปบางส่วน'), ('consumed', 'ใช้หมดแล้ว')], default='available', editable=False, max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='coilnumber',
+            index=models.Index(fields=['status', 'id'], name='coilnumber_status_idx'),
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
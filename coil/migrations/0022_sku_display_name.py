@@ -0,0 +1,40 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:57
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_display_names(apps, schema_editor):
+    """Same format as SKU.compose_display_name() at the time of this migration"""
+    SKU = apps.get_model('coil', 'SKU')
+
+    changed = []
+    for sku in SKU.objects.select_related('manufacturer').iterator(chunk_size=2000):
+        dims = 'x'.join(filter(None, [sku.thickness, sku.width, sku.length]))
+        color = re.sub(r'[\u0E00-\u0E7F]+', '', sku.color) if sku.color else ''
+        manufacturer = sku.manufacturer.name or f'Supplier #{sku.manufacturer.pk}'
+        parts = [sku.Type0, sku.Type1, sku.Type2, dims, color, sku.grade, manufacturer, sku.note1]
+        name = '-'.join(str(part) for part in parts if part)
+        if sku.note2:
+            name = f'{name} {sku.note2}'
+        sku.display_name = re.sub(r'-+', '-', name).strip('- ')
+        changed.append(sku)
+
+    SKU.objects.bulk_update(changed, ['display_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0021_coilnumber_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sku',
+            name='display_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1024),
+        ),
+        migrations.RunPython(backfill_display_names, migrations.RunPython.noop),
+    ]
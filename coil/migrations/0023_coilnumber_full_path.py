@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+def backfill_full_paths(apps, schema_editor):
+    """Lot-PalletNumber-CoilNumber for existing coils"""
+    CoilNumber = apps.get_model('coil', 'CoilNumber')
+
+    changed = []
+    for coil in CoilNumber.objects.select_related('coilpallet__coilin').iterator(chunk_size=2000):
+        coil.full_path = f'{coil.coilpallet.coilin.lot}-{coil.coilpallet.number}-{coil.number}'
+        changed.append(coil)
+
+    CoilNumber.objects.bulk_update(changed, ['full_path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0022_sku_display_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coilnumber',
+            name='full_path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=800),
+        ),
+        migrations.RunPython(backfill_full_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0023_coilnumber_full_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessDepartment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('process_name', models.CharField(max_length=255, unique=True, verbose_name='ชื่อกระบวนการ')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='coil.department', verbose_name='แผนก')),
+            ],
+            options={
+                'verbose_name': 'กระบวนการของแผนก',
+                'verbose_name_plural': 'กระบวนการของแผนก',
+            },
+        ),
+    ]
@@ -0,0 +1,223 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+STEPS = range(1, 21)
+FIELDS = [name for step in STEPS for name in (f'job_process_{step}', f'job_process_{step}_duefin')]
+
+
+def move_processes(apps, schema_editor):
+    """job_process_N / job_process_N_duefin -> JobProcess(step=N)"""
+    Job = apps.get_model('coil', 'Job')
+    JobProcess = apps.get_model('coil', 'JobProcess')
+
+    processes = []
+    for job in Job.objects.only(*FIELDS).iterator(chunk_size=2000):
+        for step in STEPS:
+            process = getattr(job, f'job_process_{step}')
+            due_date = getattr(job, f'job_process_{step}_duefin')
+            # The job form left every column optional, so a step may hold only a date
+            if process or due_date:
+                processes.append(JobProcess(job_id=job.pk, step=step, process=process or '', due_date=due_date))
+
+    JobProcess.objects.bulk_create(processes, batch_size=500)
+
+
+def restore_processes(apps, schema_editor):
+    Job = apps.get_model('coil', 'Job')
+    JobProcess = apps.get_model('coil', 'JobProcess')
+
+    jobs = {}
+    for row in JobProcess.objects.filter(step__in=STEPS).iterator(chunk_size=2000):
+        job = jobs.setdefault(row.job_id, Job(pk=row.job_id))
+        setattr(job, f'job_process_{row.step}', row.process or None)
+        setattr(job, f'job_process_{row.step}_duefin', row.due_date)
+
+    Job.objects.bulk_update(jobs.values(), FIELDS, batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0024_processdepartment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobProcess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.PositiveSmallIntegerField(verbose_name='ลำดับ')),
+                ('process', models.CharField(blank=True, max_length=255, verbose_name='กระบวนการ')),
+                ('due_date', models.DateField(blank=True, null=True, verbose_name='Due Fin')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processes', to='coil.job')),
+            ],
+            options={
+                'ordering': ['job', 'step'],
+                'indexes': [models.Index(fields=['due_date', 'process'], name='jobprocess_due_process_idx')],
+                'constraints': [models.UniqueConstraint(fields=('job', 'step'), name='jobprocess_job_step_uniq')],
+            },
+        ),
+        migrations.RunPython(move_processes, restore_processes),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_1',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_1_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_2',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_2_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_3',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_3_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_4',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_4_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_5',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_5_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_6',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_6_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_7',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_7_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_8',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_8_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_9',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_9_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_10',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_10_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_11',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_11_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_12',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_12_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_13',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_13_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_14',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_14_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_15',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_15_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_16',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_16_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_17',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_17_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_18',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_18_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_19',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_19_duefin',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_20',
+        ),
+        migrations.RemoveField(
+            model_name='job',
+            name='job_process_20_duefin',
+        ),
+    ]
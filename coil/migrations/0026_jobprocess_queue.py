@@ -0,0 +1,54 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_departments(apps, schema_editor):
+    """Queue existing steps under the department their process name resolves to"""
+    from coil.departments import DepartmentMatcher
+
+    Department = apps.get_model('coil', 'Department')
+    ProcessDepartment = apps.get_model('coil', 'ProcessDepartment')
+    JobProcess = apps.get_model('coil', 'JobProcess')
+
+    matcher = DepartmentMatcher(
+        Department.objects.order_by('pk').values_list('pk', 'name'),
+        ProcessDepartment.objects.values_list('process_name', 'department_id'),
+    )
+    changed = []
+    for process in JobProcess.objects.only('pk', 'process').iterator(chunk_size=2000):
+        process.department_id = matcher.resolve(process.process)[0]
+        if process.department_id is not None:
+            changed.append(process)
+
+    JobProcess.objects.bulk_update(changed, ['department'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0025_jobprocess'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobprocess',
+            name='department',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='coil.department', verbose_name='แผนก'),
+        ),
+        migrations.AddField(
+            model_name='jobprocess',
+            name='is_done',
+            field=models.BooleanField(default=False, verbose_name='เสร็จแล้ว'),
+        ),
+        migrations.AddIndex(
+            model_name='jobprocess',
+            index=models.Index(fields=['is_done', 'due_date'], name='jobprocess_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobprocess',
+            index=models.Index(fields=['department', 'is_done', 'due_date'], name='jobprocess_queue_idx'),
+        ),
+        migrations.RunPython(backfill_departments, migrations.RunPython.noop),
+    ]
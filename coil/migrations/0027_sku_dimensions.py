@@ -0,0 +1,67 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:26
+
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def parse(value):
+    match = NUMBER.match((value or '').replace(',', '').strip())
+    if not match:
+        return None
+    try:
+        number = Decimal(match.group()).quantize(Decimal('0.001'))
+    except InvalidOperation:
+        return None
+    return number if number < 10 ** 7 else None
+
+
+def backfill_dimensions(apps, schema_editor):
+    """Numeric thickness/width/length for existing SKUs"""
+    SKU = apps.get_model('coil', 'SKU')
+
+    changed = []
+    for sku in SKU.objects.only('thickness', 'width', 'length').iterator(chunk_size=2000):
+        sku.thickness_mm = parse(sku.thickness)
+        sku.width_mm = parse(sku.width)
+        sku.length_mm = parse(sku.length)
+        changed.append(sku)
+
+    SKU.objects.bulk_update(changed, ['thickness_mm', 'width_mm', 'length_mm'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0026_jobprocess_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sku',
+            name='length_mm',
+            field=models.DecimalField(decimal_places=3, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='sku',
+            name='thickness_mm',
+            field=models.DecimalField(decimal_places=3, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='sku',
+            name='width_mm',
+            field=models.DecimalField(decimal_places=3, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sku',
+            index=models.Index(fields=['thickness_mm', 'width_mm', 'length_mm'], name='sku_dimensions_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sku',
+            index=models.Index(fields=['width_mm', 'thickness_mm'], name='sku_width_thickness_idx'),
+        ),
+        migrations.RunPython(backfill_dimensions, migrations.RunPython.noop),
+    ]
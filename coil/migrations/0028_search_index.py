@@ -0,0 +1,63 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:02
+
+from django.db import migrations
+
+COLUMNS = 'title, body, kind UNINDEXED, target UNINDEXED'
+TABLES = {
+    'coil_search': "unicode61 remove_diacritics 2",
+    'coil_search_trigram': "trigram",
+}
+# Frozen copy of coil.search.KINDS and DOCUMENTS as of this migration
+KINDS = ['sku', 'lot', 'pallet', 'coil', 'job']
+DOCUMENTS = {
+    'sku': ('SKU', ('pk', 'display_name', 'manufacturer__name'),
+            lambda pk, name, manufacturer: (name, manufacturer, pk)),
+    'lot': ('CoilIn', ('pk', 'lot', 'supplier__name', 'owner__name'),
+            lambda pk, lot, supplier, owner: (lot, ' '.join(filter(None, (supplier, owner))), pk)),
+    'pallet': ('CoilPallet', ('pk', 'number', 'coilin__lot', 'coilin_id'),
+               lambda pk, number, lot, lot_id: (number, lot, lot_id)),
+    'coil': ('CoilNumber', ('pk', 'number', 'full_path', 'coilpallet__coilin_id'),
+             lambda pk, number, path, lot_id: (number, path, lot_id)),
+    'job': ('Job', ('pk', 'job_number', 'job_name_short'),
+            lambda pk, number, name: (number, name, pk)),
+}
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 tables for coil.search, filled from the existing rows"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, tokenizer in TABLES.items():
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5({COLUMNS}, tokenize='{tokenizer}')")
+
+    with schema_editor.connection.cursor() as cursor:
+        for kind, (model_name, fields, document) in DOCUMENTS.items():
+            model = apps.get_model('coil', model_name)
+            documents = []
+            for row in model.objects.values_list(*fields).iterator(chunk_size=2000):
+                title, body, target = document(*row)
+                rowid = row[0] * len(KINDS) + KINDS.index(kind)
+                documents.append((rowid, title or '', (body or '').strip(), kind, target))
+            for table in TABLES:
+                cursor.executemany(
+                    f'INSERT INTO {table} (rowid, title, body, kind, target) VALUES (%s, %s, %s, %s, %s)',
+                    documents,
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in TABLES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coil', '0027_sku_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,9 +1,13 @@
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
 import re
+from decimal import Decimal, InvalidOperation
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
+
+from . import rbac, reference, search
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -26,18 +30,73 @@ class Owner(models.Model):
     def __str__(self):
         return self.name or f"Owner #{self.pk}"
 
+class CoilInQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate each lot with pallet_count, coil_count and total_weight."""
+        pallets = (CoilPallet.objects.filter(coilin=OuterRef('pk'))
+                   .order_by().values('coilin').annotate(n=Count('pk')))
+        coils = (CoilNumber.objects.filter(coilpallet__coilin=OuterRef('pk'))
+                 .order_by().values('coilpallet__coilin')
+                 .annotate(n=Count('pk'), kg=Sum('weight')))
+        return self.annotate(
+            pallet_count=Coalesce(Subquery(pallets.values('n')), Value(0)),
+            coil_count=Coalesce(Subquery(coils.values('n')), Value(0)),
+            total_weight=Coalesce(Subquery(coils.values('kg')), Value(0.0)),
+        )
+
 class CoilIn(models.Model):
     timestamp1 = models.DateTimeField(null=True, blank=True)
     timestamp2 = models.DateField(auto_now=True)
     user = models.ForeignKey(Profile, on_delete=models.CASCADE)
-    lot = models.CharField(max_length=255, null=True, blank=True)
+    lot = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
     owner = models.ForeignKey(Owner, on_delete=models.CASCADE)
 
+    objects = CoilInQuerySet.as_manager()
 
     def __str__(self):
         return self.lot or f"CoilIn #{self.pk}"
 
+class SKUQuerySet(models.QuerySet):
+    def refresh_display_names(self):
+        """Recompute display_name for these SKUs; returns the number that changed."""
+        changed = []
+        for sku in self.select_related('manufacturer').iterator(chunk_size=2000):
+            name = sku.compose_display_name()
+            if sku.display_name != name:
+                sku.display_name = name
+                changed.append(sku)
+        SKU.objects.bulk_update(changed, ['display_name'], batch_size=500)
+        return len(changed)
+
+    def refresh_dimensions(self):
+        """Re-parse the numeric dimension columns of these SKUs; returns the number that changed."""
+        fields = list(DIMENSION_FIELDS.values())
+        changed = []
+        for sku in self.only(*DIMENSION_FIELDS, *fields).iterator(chunk_size=2000):
+            before = [getattr(sku, field) for field in fields]
+            sku.set_dimensions()
+            if [getattr(sku, field) for field in fields] != before:
+                changed.append(sku)
+        SKU.objects.bulk_update(changed, fields, batch_size=500)
+        return len(changed)
+
+# Leading number of a dimension such as "1.6", "1,219" or "2438 mm"; "C" (coil) has none
+DIMENSION_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+DIMENSION_FIELDS = {'thickness': 'thickness_mm', 'width': 'width_mm', 'length': 'length_mm'}
+
+def parse_dimension(value):
+    """Decimal millimetres in a free-text dimension, or None."""
+    match = DIMENSION_NUMBER.match((value or '').replace(',', '').strip())
+    if not match:
+        return None
+    try:
+        number = Decimal(match.group()).quantize(Decimal('0.001'))
+    except InvalidOperation:
+        return None
+    # Must fit DecimalField(max_digits=10, decimal_places=3)
+    return number if number < 10 ** 7 else None
+
 class SKU(models.Model):
     Type0 = models.CharField(max_length=255, default='')
     Type1 = models.CharField(max_length=255, default='')
@@ -50,6 +109,14 @@ class SKU(models.Model):
     manufacturer = models.ForeignKey(Supplier, on_delete=models.CASCADE)
     note1 = models.CharField(max_length=255, default='', verbose_name='Note1 ขอบ กับ HRC')
     note2 = models.CharField(max_length=255, default='', blank=True, verbose_name='หมายเหตุ')
+    # Formatted SKU code, computed on save so rendering needs no regex or manufacturer lookup
+    display_name = models.CharField(max_length=1024, default='', editable=False, db_index=True)
+    # thickness/width/length parsed on save, for exact and range filters that can use an index
+    thickness_mm = models.DecimalField(max_digits=10, decimal_places=3, null=True, editable=False)
+    width_mm = models.DecimalField(max_digits=10, decimal_places=3, null=True, editable=False)
+    length_mm = models.DecimalField(max_digits=10, decimal_places=3, null=True, editable=False)
+
+    objects = SKUQuerySet.as_manager()
 
     class Meta:
         constraints = [
@@ -58,8 +125,15 @@ class SKU(models.Model):
                 name='unique_sku_combination'
             )
         ]
+        indexes = [
+            models.Index(fields=['thickness_mm', 'width_mm', 'length_mm'], name='sku_dimensions_idx'),
+            models.Index(fields=['width_mm', 'thickness_mm'], name='sku_width_thickness_idx'),
+        ]
 
     def __str__(self):
+        return self.display_name or self.compose_display_name()
+
+    def compose_display_name(self):
         # Example format: เหล็กแผ่น ตปท-2T-1.6x89xC-FGY-85sk-D1-SE 4648
         
         # 1. Join dimensions
@@ -91,31 +165,150 @@ class SKU(models.Model):
 
         return cleaned_str
 
+    def set_dimensions(self):
+        for text_field, number_field in DIMENSION_FIELDS.items():
+            setattr(self, number_field, parse_dimension(getattr(self, text_field)))
+
+    def save(self, *args, **kwargs):
+        self.display_name = self.compose_display_name()
+        self.set_dimensions()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'display_name', *DIMENSION_FIELDS.values()}
+        super().save(*args, **kwargs)
+
+class CoilPalletQuerySet(models.QuerySet):
+    def for_labels(self):
+        """
+        Load everything a pallet label shows: the lot with supplier and owner,
+        the SKU, total_count/total_weight computed in SQL and the coil rows
+        prefetched into ``all_coils``.
+        """
+        coils = CoilNumber.objects.order_by('pk')
+        return (self
+                .select_related('coilin', 'coilin__supplier', 'coilin__owner', 'type0')
+                .annotate(total_count=Count('coilnumber'),
+                          total_weight=Coalesce(Sum('coilnumber__weight'), Value(0.0)))
+                .prefetch_related(Prefetch('coilnumber_set', queryset=coils, to_attr='all_coils')))
+
 class CoilPallet(models.Model):
     coilin = models.ForeignKey(CoilIn, on_delete=models.CASCADE)
     number = models.CharField(max_length=255, unique=True)
     type0 = models.ForeignKey(SKU, on_delete=models.CASCADE)
 
+    objects = CoilPalletQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.coilin} - Pallet {self.number}"
 
 
+# CoilOut.full_coil_partial value for a coil taken out whole
+FULL_COIL = 'เต็มม้วน'
+
+def coil_usage(prefix=''):
+    """
+    Aggregates over coil-out rows used to derive a coil's availability.
+    ``prefix`` is the path from the queried model to CoilOut.
+    """
+    full = Q(**{f'{prefix}full_coil_partial': FULL_COIL})
+    return {
+        'out_count': Count(f'{prefix}pk'),
+        'full_count': Count(f'{prefix}pk', filter=full),
+        'cut_weight': Sum(f'{prefix}coil_kg', filter=~full),
+    }
+
+class CoilNumberQuerySet(models.QuerySet):
+    def available(self):
+        """Coils that can still be cut (uses coilnumber_status_idx)."""
+        return self.filter(status__in=[CoilNumber.AVAILABLE, CoilNumber.PARTIAL])
+
+    def refresh_availability(self):
+        """Recompute status and remaining_weight of these coils from their coil-outs."""
+        changed = []
+        for coil in self.annotate(**coil_usage('coilout__')):
+            before = (coil.status, coil.remaining_weight)
+            coil.set_availability(coil.out_count, coil.full_count, coil.cut_weight)
+            if (coil.status, coil.remaining_weight) != before:
+                changed.append(coil)
+        CoilNumber.objects.bulk_update(changed, ['status', 'remaining_weight'])
+
+    def refresh_full_paths(self):
+        """Recompute full_path for these coils; returns the number that changed."""
+        changed = []
+        for coil in self.select_related('coilpallet__coilin').iterator(chunk_size=2000):
+            path = coil.compose_full_path()
+            if coil.full_path != path:
+                coil.full_path = path
+                changed.append(coil)
+        CoilNumber.objects.bulk_update(changed, ['full_path'], batch_size=500)
+        return len(changed)
+
 class CoilNumber(models.Model):
+    AVAILABLE = 'available'
+    PARTIAL = 'partial'
+    CONSUMED = 'consumed'
+    STATUS_CHOICES = [
+        (AVAILABLE, 'พร้อมใช้'),
+        (PARTIAL, 'ตัดไปบางส่วน'),
+        (CONSUMED, 'ใช้หมดแล้ว'),
+    ]
+
     coilpallet = models.ForeignKey(CoilPallet, on_delete=models.CASCADE)
-    number = models.CharField(max_length=255)
+    number = models.CharField(max_length=255, db_index=True)
     weight = models.FloatField(null=True, blank=True)
+    # Maintained from the coil's CoilOut rows, see set_availability()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=AVAILABLE, editable=False)
+    remaining_weight = models.FloatField(null=True, blank=True, editable=False)
+    # Lot-PalletNumber-CoilNumber, kept in step with the lot and pallet by signals
+    full_path = models.CharField(max_length=800, default='', editable=False, db_index=True)
+
+    objects = CoilNumberQuerySet.as_manager()
 
     class Meta:
         unique_together = ('coilpallet', 'number')
+        indexes = [
+            models.Index(fields=['status', 'id'], name='coilnumber_status_idx'),
+        ]
 
-    def __str__(self):
+    def set_availability(self, out_count, full_count, cut_weight):
+        """Derive status and remaining_weight from this coil's coil-out totals."""
+        if full_count:
+            self.status, self.remaining_weight = self.CONSUMED, 0.0
+        elif self.weight is None:
+            self.status = self.PARTIAL if out_count else self.AVAILABLE
+            self.remaining_weight = None
+        else:
+            self.remaining_weight = max(self.weight - (cut_weight or 0), 0.0)
+            if not out_count:
+                self.status = self.AVAILABLE
+            elif self.remaining_weight > 0:
+                self.status = self.PARTIAL
+            else:
+                self.status = self.CONSUMED
+
+    def save(self, *args, **kwargs):
+        # The weight may have been edited, so re-derive what is left of it
+        usage = {'out_count': 0, 'full_count': 0, 'cut_weight': None}
+        if self.pk:
+            usage = CoilOut.objects.filter(coil_number_id=self.pk).aggregate(**coil_usage())
+        self.set_availability(**usage)
+        self.full_path = self.compose_full_path()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'status', 'remaining_weight', 'full_path'}
+        super().save(*args, **kwargs)
+
+    def compose_full_path(self):
         # Format: Lot-PalletNumber-CoilNumber
         # e.g., K-25007-PL03(3)-C02
         try:
             return f"{self.coilpallet.coilin.lot}-{self.coilpallet.number}-{self.number}"
-        except AttributeError:
+        except (AttributeError, CoilPallet.DoesNotExist, CoilIn.DoesNotExist):
             # Fallback if relationships are missing
-            return self.number or f"Coil #{self.pk}"
+            return ''
+
+    def __str__(self):
+        return self.full_path or self.number or f"Coil #{self.pk}"
 
 class Label(models.Model):
     name = models.CharField(max_length=255, null=True, blank=True)
@@ -156,7 +349,7 @@ class NW(models.Model):
 
 class Job(models.Model):
     date_job = models.DateField(null=True, blank=True)
-    job_number = models.CharField(max_length=255, null=True, blank=True)
+    job_number = models.CharField(max_length=255, null=True, blank=True, db_index=True)
 
     def __str__(self):
         return self.job_number or "Job Without Number"
@@ -167,46 +360,85 @@ class Job(models.Model):
     job_note_job = models.CharField(max_length=255, null=True, blank=True)
     job_note_process = models.CharField(max_length=255, null=True, blank=True)
     job_note_packing = models.CharField(max_length=255, null=True, blank=True)
-    job_process_1 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_1_duefin = models.DateField(null=True, blank=True)
-    job_process_2 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_2_duefin = models.DateField(null=True, blank=True)
-    job_process_3 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_3_duefin = models.DateField(null=True, blank=True)
-    job_process_4 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_4_duefin = models.DateField(null=True, blank=True)
-    job_process_5 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_5_duefin = models.DateField(null=True, blank=True)
-    job_process_6 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_6_duefin = models.DateField(null=True, blank=True)
-    job_process_7 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_7_duefin = models.DateField(null=True, blank=True)
-    job_process_8 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_8_duefin = models.DateField(null=True, blank=True)
-    job_process_9 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_9_duefin = models.DateField(null=True, blank=True)
-    job_process_10 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_10_duefin = models.DateField(null=True, blank=True)
-    job_process_11 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_11_duefin = models.DateField(null=True, blank=True)
-    job_process_12 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_12_duefin = models.DateField(null=True, blank=True)
-    job_process_13 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_13_duefin = models.DateField(null=True, blank=True)
-    job_process_14 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_14_duefin = models.DateField(null=True, blank=True)
-    job_process_15 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_15_duefin = models.DateField(null=True, blank=True)
-    job_process_16 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_16_duefin = models.DateField(null=True, blank=True)
-    job_process_17 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_17_duefin = models.DateField(null=True, blank=True)
-    job_process_18 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_18_duefin = models.DateField(null=True, blank=True)
-    job_process_19 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_19_duefin = models.DateField(null=True, blank=True)
-    job_process_20 = models.CharField(max_length=255, null=True, blank=True)
-    job_process_20_duefin = models.DateField(null=True, blank=True)
+
+class JobProcessQuerySet(models.QuerySet):
+    def due_between(self, start, end):
+        """Steps due from start to end inclusive, served by the (due_date, process) index."""
+        return self.filter(due_date__range=(start, end))
+
+    def with_process_names(self, names):
+        """Steps whose process, with whitespace collapsed and case ignored, is one of ``names``."""
+        q = Q()
+        for name in names:
+            words = name.split()
+            if words:
+                q |= Q(process__iregex=r'^\s*' + r'\s+'.join(map(re.escape, words)) + r'\s*$')
+        return self.filter(q) if q else self.none()
+
+    def resolvable_to(self, department_name):
+        """Steps whose process could resolve to a department called ``department_name``."""
+        from .departments import process_pattern
+
+        pattern = process_pattern(department_name)
+        return self.filter(process__iregex=pattern) if pattern else self.none()
+
+    def refresh_departments(self):
+        """Re-resolve the department of these steps; returns the number that changed."""
+        from .departments import get_matcher
+
+        matcher = get_matcher()
+        changed = []
+        for process in self.only('pk', 'process', 'department').iterator(chunk_size=2000):
+            department_id = matcher.resolve(process.process)[0]
+            if process.department_id != department_id:
+                process.department_id = department_id
+                changed.append(process)
+        JobProcess.objects.bulk_update(changed, ['department'], batch_size=500)
+        return len(changed)
+
+class JobProcess(models.Model):
+    """One process step of a job, in the order the job goes through them."""
+    MAX_STEPS = 20
+
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='processes')
+    step = models.PositiveSmallIntegerField(verbose_name='ลำดับ')
+    # Blank on steps migrated from a job_process_N_duefin without a job_process_N
+    process = models.CharField(max_length=255, blank=True, verbose_name='กระบวนการ')
+    due_date = models.DateField(null=True, blank=True, verbose_name='Due Fin')
+    is_done = models.BooleanField(default=False, verbose_name='เสร็จแล้ว')
+    # Resolved from the process name on save; the scheduling board queues steps by it
+    department = models.ForeignKey(
+        'Department', on_delete=models.SET_NULL, null=True, blank=True, editable=False, verbose_name='แผนก',
+    )
+
+    objects = JobProcessQuerySet.as_manager()
+
+    def compose_department_id(self):
+        # departments imports this module
+        from .departments import resolve_department
+        return resolve_department(self.process, remember=True)
+
+    def save(self, *args, **kwargs):
+        self.department_id = self.compose_department_id()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'department'}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.job} #{self.step} {self.process}"
+
+    class Meta:
+        ordering = ['job', 'step']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'step'], name='jobprocess_job_step_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['due_date', 'process'], name='jobprocess_due_process_idx'),
+            # Open steps by due date: the whole board, and one department's queue
+            models.Index(fields=['is_done', 'due_date'], name='jobprocess_open_due_idx'),
+            models.Index(fields=['department', 'is_done', 'due_date'], name='jobprocess_queue_idx'),
+        ]
 
 class Department(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name='ชื่อแผนก')
@@ -220,6 +452,18 @@ class Department(models.Model):
         verbose_name = 'แผนกที่ตัด'
         verbose_name_plural = 'แผนกที่ตัด'
 
+class ProcessDepartment(models.Model):
+    """Saved process name -> department resolution used by get_job_details."""
+    process_name = models.CharField(max_length=255, unique=True, verbose_name='ชื่อกระบวนการ')
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, verbose_name='แผนก')
+
+    def __str__(self):
+        return f"{self.process_name} -> {self.department}"
+
+    class Meta:
+        verbose_name = 'กระบวนการของแผนก'
+        verbose_name_plural = 'กระบวนการของแผนก'
+
 class CoilOut(models.Model):
     timestamp1 = models.DateTimeField(null=True, blank=True)
     timestamp2 = models.DateField(auto_now=True)
@@ -232,9 +476,140 @@ class CoilOut(models.Model):
     job = models.ForeignKey(Job, on_delete=models.CASCADE, null=True, blank=True)
     department_cutting = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='แผนกที่ตัด')
     note_1 = models.CharField(max_length=255, null=True, blank=True, verbose_name='Note-1')
-   
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order of the coil-out list
+            models.Index(fields=['-timestamp2', '-id'], name='coilout_ts2_id_idx'),
+        ]
 
     def __str__(self):
         return str(self.coil_number) if self.coil_number else f"CoilOut #{self.pk}"
 
+@receiver(post_save, sender=CoilIn)
+def update_lot_coil_paths(sender, instance, created, **kwargs):
+    # The lot number is the first part of every coil's full_path
+    if not created:
+        CoilNumber.objects.filter(coilpallet__coilin=instance).refresh_full_paths()
+        # bulk_update skips the search receivers below
+        search.reindex(CoilPallet.objects.filter(coilin=instance))
+        search.reindex(CoilNumber.objects.filter(coilpallet__coilin=instance))
+
+@receiver(post_save, sender=CoilPallet)
+def update_pallet_coil_paths(sender, instance, created, **kwargs):
+    # Covers a renumbered pallet as well as one moved to another lot
+    if not created:
+        CoilNumber.objects.filter(coilpallet=instance).refresh_full_paths()
+        search.reindex(CoilNumber.objects.filter(coilpallet=instance))
+
+@receiver(post_save, sender=Supplier)
+def update_sku_display_names(sender, instance, created, **kwargs):
+    # The manufacturer name is part of every SKU code it makes
+    if not created and SKU.objects.filter(manufacturer=instance).refresh_display_names():
+        reference.invalidate(SKU)
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Owner)
+def reindex_named_documents(sender, instance, created, **kwargs):
+    # Supplier and owner names are part of the lot and SKU search documents
+    if not created:
+        search.reindex(CoilIn.objects.filter(**{sender._meta.model_name: instance}))
+        if sender is Supplier:
+            search.reindex(SKU.objects.filter(manufacturer=instance))
+
+@receiver(post_save, sender=SKU)
+@receiver(post_save, sender=CoilIn)
+@receiver(post_save, sender=CoilPallet)
+@receiver(post_save, sender=CoilNumber)
+@receiver(post_save, sender=Job)
+def index_search_document(sender, instance, **kwargs):
+    search.reindex(sender.objects.filter(pk=instance.pk))
+
+@receiver(post_delete, sender=SKU)
+@receiver(post_delete, sender=CoilIn)
+@receiver(post_delete, sender=CoilPallet)
+@receiver(post_delete, sender=CoilNumber)
+@receiver(post_delete, sender=Job)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove(sender, [instance.pk])
+
+@receiver(post_save, sender=Supplier)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_save, sender=Owner)
+@receiver(post_delete, sender=Owner)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=SKU)
+@receiver(post_delete, sender=SKU)
+@receiver(post_save, sender=ProcessDepartment)
+@receiver(post_delete, sender=ProcessDepartment)
+def invalidate_reference_choices(sender, instance, **kwargs):
+    reference.invalidate(sender)
+
+@receiver(pre_delete, sender=Department)
+def remember_queued_job_processes(sender, instance, **kwargs):
+    # on_delete=SET_NULL clears the steps' department before post_delete
+    instance._queued_process_ids = list(
+        JobProcess.objects.filter(department=instance, is_done=False).values_list('pk', flat=True)
+    )
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def requeue_job_processes(sender, instance, **kwargs):
+    # Runs after the invalidation above, so the matcher already sees the change.
+    # Only the steps queued at the department and those named like it can move.
+    open_steps = JobProcess.objects.filter(is_done=False)
+    if hasattr(instance, '_queued_process_ids'):
+        queued = open_steps.filter(pk__in=instance._queued_process_ids)
+    else:
+        queued = open_steps.filter(department=instance)
+    (queued | open_steps.resolvable_to(instance.name)).refresh_departments()
+
+@receiver(pre_save, sender=ProcessDepartment)
+def remember_previous_process_name(sender, instance, **kwargs):
+    # A renamed mapping no longer applies to the steps under its old name
+    instance._previous_process_name = None
+    if instance.pk:
+        instance._previous_process_name = (
+            ProcessDepartment.objects.filter(pk=instance.pk).values_list('process_name', flat=True).first()
+        )
+
+@receiver(post_save, sender=ProcessDepartment)
+@receiver(post_delete, sender=ProcessDepartment)
+def requeue_mapped_job_processes(sender, instance, **kwargs):
+    # A mapping saved by resolve_department only records what the steps already resolve to
+    if getattr(instance, 'recorded_match', False):
+        return
+    # Deleted along with its department, whose own receiver requeues the steps
+    if isinstance(kwargs.get('origin'), Department):
+        return
+    names = {instance.process_name, getattr(instance, '_previous_process_name', None)} - {None}
+    JobProcess.objects.filter(is_done=False).with_process_names(names).refresh_departments()
+
+@receiver(pre_save, sender=CoilOut)
+def remember_previous_coil(sender, instance, **kwargs):
+    # An edit may move the coil-out to another coil; both need refreshing
+    instance._previous_coil_number_id = None
+    if instance.pk:
+        instance._previous_coil_number_id = (
+            CoilOut.objects.filter(pk=instance.pk).values_list('coil_number_id', flat=True).first()
+        )
 
+@receiver(post_save, sender=CoilOut)
+@receiver(post_delete, sender=CoilOut)
+def update_coil_availability(sender, instance, **kwargs):
+    coil_ids = {instance.coil_number_id, getattr(instance, '_previous_coil_number_id', None)} - {None}
+    CoilNumber.objects.filter(pk__in=coil_ids).refresh_availability()
+
+@receiver(m2m_changed, sender=User.groups.through)
+def forget_user_groups(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        rbac.forget_all()
+        if not reverse:
+            # Changed from the user side: also drop the names memoized on it
+            rbac.forget_group_names(instance)
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def retire_cached_groups(sender, instance, **kwargs):
+    rbac.forget_all()
@@ -0,0 +1,153 @@
+"""
+Opt-in SQL profiler for the coil views.
+
+With ``COIL_SQL_PROFILER = True``, ``SQLProfilerMiddleware`` records every
+query run while a coil view handles a request (including template
+rendering and the body of a streamed response) and aggregates per URL
+name: requests, query count, SQL time and repeated query shapes. A shape is the SQL with literals and ``IN``
+lists collapsed; one that runs several times in a single request is the
+usual sign of an N+1 loop. Results are shown at ``profiler/`` (staff only)
+and ``api/profiler/``.
+
+The statistics live in the worker process; under several gunicorn workers
+each one reports its own share. When the setting is off the middleware
+removes itself at startup.
+"""
+import os
+import re
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .instrumentation import QueryRecorder, record_queries, record_streaming, view_name
+
+# Fingerprints kept per URL name, most repeated first
+MAX_FINGERPRINTS = 20
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Items are split at commas only, so a subquery fails to match without backtracking
+_IN_LIST = re.compile(r'\bIN \((?:\s*[^(),\s][^(),]*,)*\s*[^(),\s][^(),]*\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Query shape: literals replaced with ``?`` and IN lists collapsed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class ProfilingRecorder(QueryRecorder):
+    """QueryRecorder that also counts query shapes and their time."""
+
+    def __init__(self):
+        super().__init__()
+        self.shapes = Counter()
+        self.shape_time = Counter()
+
+    def record(self, sql, duration):
+        super().record(sql, duration)
+        shape = fingerprint(sql)
+        self.shapes[shape] += 1
+        self.shape_time[shape] += duration
+
+
+class ViewProfile:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_time = 0.0
+        # shape -> [requests where it repeated, most repeats in one request, total repeats, time]
+        self.repeated = {}
+
+    def observe(self, recorder):
+        self.requests += 1
+        self.queries += recorder.count
+        self.max_queries = max(self.max_queries, recorder.count)
+        self.sql_time += recorder.duration
+        for shape, count in recorder.shapes.items():
+            if count < 2:
+                continue
+            stats = self.repeated.setdefault(shape, [0, 0, 0, 0.0])
+            stats[0] += 1
+            stats[1] = max(stats[1], count)
+            stats[2] += count
+            stats[3] += recorder.shape_time[shape]
+
+    def as_dict(self):
+        top = sorted(self.repeated.items(), key=lambda item: item[1][2], reverse=True)[:MAX_FINGERPRINTS]
+        return {
+            'requests': self.requests,
+            'queries': self.queries,
+            'avg_queries': round(self.queries / self.requests, 2),
+            'max_queries': self.max_queries,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'avg_sql_ms': round(self.sql_time * 1000 / self.requests, 2),
+            'repeated_queries': [
+                {
+                    'fingerprint': shape,
+                    'requests': requests,
+                    'max_per_request': most,
+                    'total': total,
+                    'sql_ms': round(seconds * 1000, 2),
+                }
+                for shape, (requests, most, total, seconds) in top
+            ],
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, recorder):
+        with self._lock:
+            profile = self._views.get(view)
+            if profile is None:
+                profile = self._views[view] = ViewProfile()
+            profile.observe(recorder)
+
+    def snapshot(self):
+        """Per-URL-name statistics, the views running the most queries first."""
+        with self._lock:
+            views = [{'url_name': name, **profile.as_dict()} for name, profile in self._views.items()]
+        views.sort(key=lambda view: view['queries'], reverse=True)
+        return {'pid': os.getpid(), 'views': views}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+stats = Profiler()
+
+
+def is_enabled():
+    return getattr(settings, 'COIL_SQL_PROFILER', False)
+
+
+class SQLProfilerMiddleware:
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = ProfilingRecorder()
+        with record_queries(recorder):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        # Only the coil views, not the admin or the profiler's own pages
+        if match is not None and match.app_name == 'coil' and not (match.url_name or '').startswith('sql_profile'):
+            if response.streaming and not response.is_async:
+                record_streaming(response, recorder, lambda: stats.observe(view_name(request), recorder))
+            else:
+                stats.observe(view_name(request), recorder)
+        return response
@@ -0,0 +1,74 @@
+"""
+Group-based permission checks shared by the views and the template filters.
+
+A user's group names are resolved in two layers:
+
+- memoized on the user object, which is the same object for the whole
+  request, so a page runs at most one lookup however many checks it makes;
+- cached across requests under ``rbac:groups:<version>:<user id>``. Any
+  membership change or group save bumps the version (see the receivers in
+  models.py), which retires every cached entry at once. The version is
+  read from the shared cache tier, never the per-process one, so a
+  revocation made in one worker applies to the next request in all of them.
+"""
+from django.core.cache import cache
+
+from .cache import bump_version, get_version
+
+CACHE_ATTR = '_coil_group_names'
+CACHE_TIMEOUT = 60 * 60
+
+VIEWER_GROUPS = ['Viewer', 'Coil_In', 'Coil_Out', 'Adjuster', 'SKU_Manager']
+
+
+def forget_all():
+    """Invalidate the cached group names of every user."""
+    bump_version('rbac')
+
+
+def get_group_names(user):
+    """Names of the groups the user belongs to, from memory when possible."""
+    if not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, CACHE_ATTR, None)
+    if names is None:
+        key = f'rbac:groups:{get_version("rbac", shared=True)}:{user.pk}'
+        names = cache.get(key)
+        if names is None:
+            names = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, names, CACHE_TIMEOUT)
+        setattr(user, CACHE_ATTR, names)
+    return names
+
+
+def forget_group_names(user):
+    """Drop the group names memoized on this user object."""
+    user.__dict__.pop(CACHE_ATTR, None)
+
+
+def has_group(user, group_names):
+    if user.is_superuser:
+        return True
+    if isinstance(group_names, str):
+        group_names = [group_names]
+    return not get_group_names(user).isdisjoint(group_names)
+
+
+def is_sku_manager(user):
+    return has_group(user, 'SKU_Manager')
+
+
+def is_coil_in(user):
+    return has_group(user, 'Coil_In')
+
+
+def is_coil_out(user):
+    return has_group(user, ['Coil_Out', 'Coil_In'])
+
+
+def is_adjuster(user):
+    return has_group(user, 'Adjuster')
+
+
+def is_viewer(user):
+    return has_group(user, VIEWER_GROUPS) or user.is_authenticated
@@ -0,0 +1,76 @@
+"""
+Cached choice lists for the reference tables (suppliers, owners, departments
+and SKUs).
+
+Each list is a tuple of ``(pk, label)`` pairs cached under
+``ref:<model>:<version>``. Saving or deleting a row bumps the model's
+version (see the receivers in models.py), so the next read rebuilds the
+list once and every form and API in between is served from the cache.
+"""
+from bisect import bisect_left
+from operator import itemgetter
+
+from django import forms
+from django.core.cache import cache
+
+from .cache import bump_version, get_version
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Lists are ordered like the forms always showed them (by pk) unless listed here.
+ORDERING = {
+    'coil.sku': 'display_name',
+}
+
+
+def _name(model):
+    return f'ref:{model._meta.label_lower}'
+
+
+def version(model):
+    return get_version(_name(model))
+
+
+def invalidate(model):
+    bump_version(_name(model))
+
+
+def choices(model):
+    """``(pk, label)`` pairs for every row of ``model``."""
+    key = f'{_name(model)}:{version(model)}'
+    result = cache.get(key)
+    if result is None:
+        ordering = ORDERING.get(model._meta.label_lower, 'pk')
+        result = tuple((obj.pk, str(obj)) for obj in model.objects.order_by(ordering))
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def prefix_matches(model, term):
+    """Choices whose label starts with ``term``; ``model`` must be ordered by its label."""
+    rows = choices(model)
+    start = bisect_left(rows, term, key=itemgetter(1))
+    end = bisect_left(rows, term + '\uffff', key=itemgetter(1))
+    return rows[start:end]
+
+
+class CachedModelChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        yield from choices(self.queryset.model)
+
+    def __len__(self):
+        return len(choices(self.queryset.model)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(choices(self.queryset.model))
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that renders its options from the cached choice list.
+    Only for unfiltered querysets; the submitted value is still validated
+    against the database.
+    """
+    iterator = CachedModelChoiceIterator
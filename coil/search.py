@@ -0,0 +1,196 @@
+"""
+Full-text search over SKUs, lots, pallets, coils and jobs.
+
+Every searchable row is a document in two SQLite FTS5 tables created by
+migration 0028:
+
+* ``coil_search`` (unicode61 tokenizer) answers word and prefix queries
+  ranked with bm25, the title weighing more than the body;
+* ``coil_search_trigram`` (trigram tokenizer) is the fallback when the word
+  index finds nothing. Thai is written without spaces, so a word in the
+  middle of ``เหล็กแผ่น`` is never a token of its own; the trigram index
+  matches any substring of three characters or more, and shorter terms are
+  matched with LIKE.
+
+A document's rowid is ``pk * len(KINDS) + kind``, so both tables are
+updated and deleted by rowid. The receivers in models.py keep the
+documents current; ``bulk_create``/``bulk_update`` skip them, so code using
+those calls ``reindex()`` itself (or run ``manage.py rebuild_search_index``).
+"""
+import re
+
+from django.apps import apps as django_apps
+from django.db import connection
+
+WORD_TABLE = 'coil_search'
+TRIGRAM_TABLE = 'coil_search_trigram'
+TABLES = (WORD_TABLE, TRIGRAM_TABLE)
+
+PAGE_SIZE = 20
+# Terms beyond this are ignored rather than building a huge MATCH expression
+MAX_TERMS = 8
+# bm25 column weights: title, body
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# The position of a kind is part of every rowid; only ever append to this list
+KINDS = ['sku', 'lot', 'pallet', 'coil', 'job']
+
+# kind -> (model name, values read, row -> (title, body, target)).
+# ``target`` is the pk the result links to: the SKU, the lot or the job.
+DOCUMENTS = {
+    'sku': ('SKU', ('pk', 'display_name', 'manufacturer__name'),
+            lambda pk, name, manufacturer: (name, manufacturer, pk)),
+    'lot': ('CoilIn', ('pk', 'lot', 'supplier__name', 'owner__name'),
+            lambda pk, lot, supplier, owner: (lot, ' '.join(filter(None, (supplier, owner))), pk)),
+    'pallet': ('CoilPallet', ('pk', 'number', 'coilin__lot', 'coilin_id'),
+               lambda pk, number, lot, lot_id: (number, lot, lot_id)),
+    'coil': ('CoilNumber', ('pk', 'number', 'full_path', 'coilpallet__coilin_id'),
+             lambda pk, number, path, lot_id: (number, path, lot_id)),
+    'job': ('Job', ('pk', 'job_number', 'job_name_short'),
+            lambda pk, number, name: (number, name, pk)),
+}
+KIND_BY_MODEL = {name.lower(): kind for kind, (name, _, _) in DOCUMENTS.items()}
+
+CHUNK_SIZE = 2000
+
+_SPACES = re.compile(r'\s+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def kind_of(model):
+    return KIND_BY_MODEL.get(model._meta.model_name)
+
+
+def _rowid(kind, pk):
+    return pk * len(KINDS) + KINDS.index(kind)
+
+
+def _delete(cursor, rowids):
+    for table in TABLES:
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(rowid,) for rowid in rowids])
+
+
+def reindex(queryset):
+    """Write the documents of every row in ``queryset``; returns the number written."""
+    kind = kind_of(queryset.model)
+    if kind is None or not is_available():
+        return 0
+    _, fields, document = DOCUMENTS[kind]
+    written = 0
+    rows = queryset.order_by().values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+    with connection.cursor() as cursor:
+        while chunk := [row for _, row in zip(range(CHUNK_SIZE), rows)]:
+            documents = []
+            for row in chunk:
+                title, body, target = document(*row)
+                documents.append((_rowid(kind, row[0]), title or '', (body or '').strip(), kind, target))
+            _delete(cursor, [doc[0] for doc in documents])
+            for table in TABLES:
+                cursor.executemany(
+                    f'INSERT INTO {table} (rowid, title, body, kind, target) VALUES (%s, %s, %s, %s, %s)',
+                    documents,
+                )
+            written += len(documents)
+    return written
+
+
+def remove(model, pks):
+    """Drop the documents of ``model`` rows with these pks."""
+    kind = kind_of(model)
+    if kind is None or not is_available():
+        return
+    with connection.cursor() as cursor:
+        _delete(cursor, [_rowid(kind, pk) for pk in pks])
+
+
+def rebuild(apps=django_apps):
+    """Empty both tables and index every row again; returns the counts per kind."""
+    if not is_available():
+        return {}
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f'DELETE FROM {table}')
+    return {
+        kind: reindex(apps.get_model('coil', name)._default_manager.all())
+        for kind, (name, _, _) in DOCUMENTS.items()
+    }
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _word_query(terms):
+    # Every term must match; the last token of each is a prefix
+    where = f'{WORD_TABLE} MATCH %s'
+    params = [' '.join(_quote(term) + '*' for term in terms)]
+    return WORD_TABLE, where, params, f'bm25({WORD_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})'
+
+
+def _trigram_query(terms):
+    # The trigram index only holds terms of three characters or more
+    long_terms = [term for term in terms if len(term) >= 3]
+    where, params = [], []
+    if long_terms:
+        where.append(f'{TRIGRAM_TABLE} MATCH %s')
+        params.append(' '.join(map(_quote, long_terms)))
+    for term in terms:
+        if len(term) < 3:
+            where.append("(title LIKE %s ESCAPE '\\' OR body LIKE %s ESCAPE '\\')")
+            params += [_like(term)] * 2
+    if long_terms:
+        rank = f'bm25({TRIGRAM_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})'
+    else:
+        rank = 'length(title)'
+    return TRIGRAM_TABLE, ' AND '.join(where), params, rank
+
+
+def _fetch(query, offset, limit):
+    table, where, params, rank = query
+    sql = (f'SELECT rowid, kind, title, body, target FROM {table} WHERE {where} '
+           f'ORDER BY {rank}, rowid LIMIT %s OFFSET %s')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        return cursor.fetchall()
+
+
+def _exists(query):
+    table, where, params, _ = query
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {table} WHERE {where} LIMIT 1', params)
+        return cursor.fetchone() is not None
+
+
+def terms(text):
+    return [term for term in _SPACES.split(text.strip()) if term][:MAX_TERMS]
+
+
+def search(text, page=1, page_size=PAGE_SIZE):
+    """
+    One page of documents matching every term of ``text``, best first.
+
+    Returns ``(results, more)``; each result is a dict with ``kind``, ``id``,
+    ``title``, ``body`` and ``target``.
+    """
+    words = terms(text)
+    if not words or not is_available():
+        return [], False
+    offset = (page - 1) * page_size
+    # Fetch one extra row to know whether there is another page
+    query = _word_query(words)
+    rows = _fetch(query, offset, page_size + 1)
+    if not rows and (page == 1 or not _exists(query)):
+        rows = _fetch(_trigram_query(words), offset, page_size + 1)
+    results = [
+        {'kind': kind, 'id': rowid // len(KINDS), 'title': title, 'body': body, 'target': target}
+        for rowid, kind, title, body, target in rows[:page_size]
+    ]
+    return results, len(rows) > page_size
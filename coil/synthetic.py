@@ -0,0 +1,153 @@
+"""
+Synthetic data for benchmarks: suppliers, owners, departments, SKUs, jobs,
+lots with pallets and coils, and coil-outs against some of the coils.
+
+Rows are written with ``bulk_create`` in chunks, which skips ``save()`` and
+the signals, so the denormalized columns (``SKU.display_name``,
+``CoilNumber.full_path``/``status``/``remaining_weight``) are filled in
+here and the search index is rebuilt at the end. The same seed always produces the same data.
+"""
+import datetime
+import random
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import search
+from .models import (
+    FULL_COIL, CoilIn, CoilNumber, CoilOut, CoilPallet, Department, Job, JobProcess, Owner, Profile, SKU, Supplier,
+)
+
+COILS_PER_PALLET = 5
+PALLETS_PER_LOT = 4
+# Share of coils with a coil-out; half of those are taken out whole
+CUT_RATIO = 0.3
+# Lots written per transaction
+LOT_CHUNK = 1000
+
+SKU_TYPES = ['เหล็กแผ่น', 'เหล็กม้วน', 'สแตนเลส', 'กัลวาไนซ์']
+COLORS = ['FGY', 'ขาว-WH', 'BK', 'RD', '']
+GRADES = ['SPHC', 'SS400', 'SGCC', '304', '430']
+PROCESSES = ['S1-ตัดแผ่น', 'S2-สลิท', 'พับ', 'เจาะ', 'S3-ตัดม้วน', 'เชื่อม']
+
+
+def _bulk(model, objs):
+    return model.objects.bulk_create(objs, batch_size=500)
+
+
+def _reference(rng, coils):
+    suppliers = _bulk(Supplier, [Supplier(name=f'SUP-{i:02d}') for i in range(20)])
+    owners = _bulk(Owner, [Owner(name=f'OWN-{i:02d}') for i in range(10)])
+    departments = _bulk(Department, [
+        Department(name=name) for name in ['ตัดแผ่น', 'สลิท', 'พับ', 'เจาะ', 'ตัดม้วน', 'เชื่อม', 'บรรจุ', 'QC']
+    ])
+
+    skus = []
+    seen = set()
+    while len(skus) < min(max(coils // 500, 50), 5000):
+        sku = SKU(
+            Type0=rng.choice(SKU_TYPES), Type1=f'{rng.randint(1, 9)}T',
+            thickness=f'{rng.choice([0.8, 1.0, 1.2, 1.6, 2.0, 2.3, 3.2, 4.5])}',
+            width=str(rng.choice([89, 120, 914, 1219, 1524])),
+            length=rng.choice(['', 'C', '2438', '3048']),
+            color=rng.choice(COLORS), grade=rng.choice(GRADES),
+            manufacturer=rng.choice(suppliers), note1=rng.choice(['D1', 'SE', 'ME', '']),
+        )
+        key = (sku.Type0, sku.Type1, sku.thickness, sku.width, sku.length, sku.color, sku.grade,
+               sku.manufacturer.pk, sku.note1)
+        if key in seen:
+            continue
+        seen.add(key)
+        sku.display_name = sku.compose_display_name()
+        sku.set_dimensions()
+        skus.append(sku)
+    skus = _bulk(SKU, skus)
+
+    today = datetime.date.today()
+    jobs = _bulk(Job, [
+        Job(
+            date_job=today - datetime.timedelta(days=rng.randint(0, 365)),
+            job_number=f'J{i:07d}', job_name_short=f'งาน {i}', job_qty=str(rng.randint(1, 500)),
+            job_duefin=today + datetime.timedelta(days=rng.randint(-30, 60)),
+        )
+        for i in range(max(coils // 20, 10))
+    ])
+    _bulk(JobProcess, [
+        JobProcess(
+            job=job, step=step, process=rng.choice(PROCESSES),
+            due_date=today + datetime.timedelta(days=rng.randint(-30, 60)),
+        )
+        for job in jobs for step in range(1, rng.randint(1, 4) + 1)
+    ])
+    # bulk_create skips save(), which resolves the department
+    JobProcess.objects.all().refresh_departments()
+    return suppliers, owners, departments, skus, jobs
+
+
+def generate(coils, seed=1, progress=None):
+    """Create about ``coils`` coils with everything around them; returns the row counts."""
+    rng = random.Random(seed)
+    user, _ = User.objects.get_or_create(username='benchmark', defaults={'is_superuser': True, 'is_staff': True})
+    profile, _ = Profile.objects.get_or_create(user=user)
+
+    with transaction.atomic():
+        suppliers, owners, departments, skus, jobs = _reference(rng, coils)
+
+    lots = -(-coils // (COILS_PER_PALLET * PALLETS_PER_LOT))
+    now = timezone.now()
+    counts = {'lots': 0, 'pallets': 0, 'coils': 0, 'coilouts': 0}
+
+    for start in range(0, lots, LOT_CHUNK):
+        with transaction.atomic():
+            coilins = _bulk(CoilIn, [
+                CoilIn(
+                    user=profile, lot=f'K-{i:07d}', supplier=rng.choice(suppliers), owner=rng.choice(owners),
+                    timestamp1=now - datetime.timedelta(minutes=(lots - i) * 30),
+                )
+                for i in range(start, min(start + LOT_CHUNK, lots))
+            ])
+            pallets = _bulk(CoilPallet, [
+                CoilPallet(coilin=coilin, number=f'PL{coilin.lot[2:]}-{p}', type0=rng.choice(skus))
+                for coilin in coilins for p in range(PALLETS_PER_LOT)
+            ])
+
+            coil_rows = []
+            cuts = []
+            for pallet in pallets:
+                for c in range(COILS_PER_PALLET):
+                    weight = round(rng.uniform(800, 3000), 1)
+                    coil = CoilNumber(
+                        coilpallet=pallet, number=f'C{c:02d}', weight=weight,
+                        full_path=f'{pallet.coilin.lot}-{pallet.number}-C{c:02d}',
+                    )
+                    if rng.random() < CUT_RATIO:
+                        full = rng.random() < 0.5
+                        cut = weight if full else round(weight * rng.uniform(0.1, 0.9), 1)
+                        coil.set_availability(1, int(full), None if full else cut)
+                        cuts.append((coil, full, cut))
+                    else:
+                        coil.set_availability(0, 0, None)
+                    coil_rows.append(coil)
+            _bulk(CoilNumber, coil_rows)
+
+            _bulk(CoilOut, [
+                CoilOut(
+                    user=profile, coil_number=coil, sku=coil.coilpallet.type0,
+                    full_coil_partial=FULL_COIL if full else 'บางส่วน', coil_kg=cut,
+                    timestamp1=now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+                    job=rng.choice(jobs), department_cutting=rng.choice(departments),
+                )
+                for coil, full, cut in cuts
+            ])
+
+        counts['lots'] += len(coilins)
+        counts['pallets'] += len(pallets)
+        counts['coils'] += len(coil_rows)
+        counts['coilouts'] += len(cuts)
+        if progress:
+            progress(counts)
+
+    search.rebuild()
+    counts.update(skus=len(skus), jobs=len(jobs))
+    return counts
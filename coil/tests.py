@@ -1,3 +1,965 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import time
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+import reportlab
+from openpyxl import load_workbook
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import departments, exports, filters, labels_pdf, profiler, rbac, reference, search, synthetic
+from . import urls as coil_urls
+from . import views
+from .instrumentation import QueryRecorder, view_metrics
+from .models import (
+    CoilIn, CoilNumber, CoilOut, CoilPallet, Department, Job, JobProcess, Owner, ProcessDepartment, Profile, SKU,
+    Supplier,
+)
+
+# The cache tiers as configured, with the shared tier in memory instead of
+# the real cache directory, which setUp() clears
+TEST_CACHES = {
+    'default': {'BACKEND': 'coil.cache.TieredCache', 'OPTIONS': {'SHARED': 'shared'}},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'coil-tests'},
+}
+
+# No Thai glyphs, but enough to render the label PDFs
+TEST_FONT = str(Path(reportlab.__file__).parent / 'fonts' / 'Vera.ttf')
+
+
+class CoilDataMixin:
+    """Builds a small lot/pallet/coil tree for view tests."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('viewer', password='pass')
+        self.user.groups.add(Group.objects.create(name='Coil_In'))
+        self.profile = Profile.objects.create(user=self.user)
+        self.supplier = Supplier.objects.create(name='SUP')
+        self.owner = Owner.objects.create(name='OWN')
+        self.sku = SKU.objects.create(
+            Type0='เหล็กแผ่น', Type1='2T', thickness='1.6', width='89',
+            color='FGY', grade='SPHC', manufacturer=self.supplier, note1='D1',
+        )
+        self.client.force_login(self.user)
+
+    def create_lots(self, count, pallets=2, coils=3):
+        start = CoilIn.objects.count()
+        for i in range(start, start + count):
+            coilin = CoilIn.objects.create(
+                user=self.profile, lot=f'K-{i:05d}', supplier=self.supplier, owner=self.owner,
+            )
+            for p in range(pallets):
+                pallet = CoilPallet.objects.create(coilin=coilin, number=f'PL{i}-{p}', type0=self.sku)
+                for c in range(coils):
+                    CoilNumber.objects.create(coilpallet=pallet, number=f'C{c:02d}', weight=100 + c)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CoilInListQueryTests(CoilDataMixin, TestCase):
+    # session, user, lots, pallets (group names come from the cache)
+    EXPECTED_QUERIES = 4
+
+    def test_query_count_is_constant(self):
+        url = reverse('coil:coilin_list')
+        self.client.get(url)
+
+        self.create_lots(1)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            self.client.get(url)
+
+        self.create_lots(10, pallets=4)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_lot_totals(self):
+        self.create_lots(1, pallets=2, coils=3)
+        coil = CoilIn.objects.with_totals().get()
+        self.assertEqual(coil.pallet_count, 2)
+        self.assertEqual(coil.coil_count, 6)
+        self.assertEqual(coil.total_weight, 2 * (100 + 101 + 102))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LabelListQueryTests(CoilDataMixin, TestCase):
+    # session, user, count, page of lots with totals (group names come from the cache)
+    EXPECTED_QUERIES = 4
+
+    def test_query_count_is_constant(self):
+        url = reverse('coil:label_list')
+        self.client.get(url)
+
+        self.create_lots(1)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            self.client.get(url)
+
+        self.create_lots(40, pallets=3)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.client.get(url, {'page': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['coils']), 41 - 30)
+        self.assertEqual(response.context['coils'][-1].coil_count, 6)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CoilOutListTests(CoilDataMixin, TestCase):
+
+    def test_malformed_cursor_shows_the_first_page(self):
+        self.create_lots(1, pallets=1, coils=1)
+        CoilOut.objects.create(user=self.profile, coil_number=CoilNumber.objects.get(), sku=self.sku)
+        url = reverse('coil:coilout_list')
+        for after in ['abc_5', '2026-02-31_1', '2026-01-01_x', 'abc']:
+            response = self.client.get(url, {'after': after})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['is_first_page'])
+            self.assertEqual(len(response.context['coilouts']), 1)
+
+        response = self.client.get(url, {'after': f'{datetime.date.today() + datetime.timedelta(days=1)}_1'})
+        self.assertFalse(response.context['is_first_page'])
+        self.assertEqual(len(response.context['coilouts']), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CoilAvailabilityTests(CoilDataMixin, TestCase):
+
+    def test_status_follows_coil_outs(self):
+        self.create_lots(1, pallets=1, coils=2)
+        coil, other = CoilNumber.objects.order_by('pk')
+
+        cut = CoilOut.objects.create(
+            user=self.profile, coil_number=coil, sku=self.sku, full_coil_partial='บางส่วน', coil_kg=30,
+        )
+        coil.refresh_from_db()
+        self.assertEqual(coil.status, CoilNumber.PARTIAL)
+        self.assertEqual(coil.remaining_weight, 70)
+
+        CoilOut.objects.create(
+            user=self.profile, coil_number=other, sku=self.sku, full_coil_partial='เต็มม้วน', coil_kg=101,
+        )
+        self.assertEqual(list(CoilNumber.objects.available()), [coil])
+
+        # Moving the coil-out to another coil frees the first one again
+        cut.coil_number = other
+        cut.save()
+        coil.refresh_from_db()
+        self.assertEqual(coil.status, CoilNumber.AVAILABLE)
+        self.assertEqual(coil.remaining_weight, 100)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AutocompleteTests(CoilDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user.groups.add(Group.objects.create(name='Coil_Out'))
+
+    def complete(self, name, **params):
+        data = self.client.get(reverse(f'coil:{name}'), params).json()
+        return [result['text'] for result in data['results']], data['pagination']['more']
+
+    def test_coil_numbers_page_through_available_coils(self):
+        self.create_lots(2, pallets=2, coils=6)
+        used, partial = CoilNumber.objects.order_by('pk')[:2]
+        CoilOut.objects.create(
+            user=self.profile, coil_number=used, sku=self.sku, full_coil_partial='เต็มม้วน', coil_kg=100,
+        )
+        CoilOut.objects.create(
+            user=self.profile, coil_number=partial, sku=self.sku, full_coil_partial='บางส่วน', coil_kg=30,
+        )
+
+        first, more = self.complete('autocomplete_coil_numbers', q='K-0000')
+        self.assertEqual((len(first), more), (20, True))
+        self.assertEqual(first, sorted(first))
+        second, more = self.complete('autocomplete_coil_numbers', q='K-0000', page=2)
+        self.assertEqual((len(second), more), (3, False))
+        self.assertNotIn(str(used), first + second)
+        self.assertIn(str(partial), first + second)
+
+        # Pallet and coil number prefixes, and a term matching nothing
+        self.assertEqual(len(self.complete('autocomplete_coil_numbers', q='PL1-1')[0]), 6)
+        self.assertEqual(len(self.complete('autocomplete_coil_numbers', q='C0')[0]), 20)
+        self.assertEqual(self.complete('autocomplete_coil_numbers', q='K-9'), ([], False))
+
+    def test_empty_or_short_terms(self):
+        self.create_lots(1, pallets=1, coils=3)
+        Job.objects.create(job_number='J001')
+        Job.objects.create()
+
+        # No term (or only spaces) lists the newest rows first
+        coils, more = self.complete('autocomplete_coil_numbers', q='  ')
+        self.assertEqual(coils, [str(coil) for coil in CoilNumber.objects.order_by('-pk')])
+        self.assertFalse(more)
+        self.assertEqual(self.complete('autocomplete_jobs'), (['Job Without Number', 'J001'], False))
+        self.assertEqual(self.complete('autocomplete_skus', q=''), ([str(self.sku)], False))
+        # A one-character term is a prefix like any other
+        self.assertEqual(self.complete('autocomplete_jobs', q='J'), (['J001'], False))
+        self.assertEqual(self.complete('autocomplete_skus', q='เ'), ([str(self.sku)], False))
+        self.assertEqual(self.complete('autocomplete_skus', q='x'), ([], False))
+        # A page that is not a number is the first page
+        self.assertEqual(len(self.complete('autocomplete_coil_numbers', page='x')[0]), 3)
+
+    def test_skus_and_jobs_paginate(self):
+        for i in range(25):
+            SKU.objects.create(Type0=f'แผ่น{i:02d}', manufacturer=self.supplier)
+        Job.objects.bulk_create(Job(job_number=f'J{i:03d}') for i in range(21))
+
+        skus, more = self.complete('autocomplete_skus', q='แผ่น')
+        self.assertEqual((len(skus), more), (20, True))
+        skus, more = self.complete('autocomplete_skus', q='แผ่น', page=2)
+        self.assertEqual((len(skus), more), (5, False))
+        self.assertEqual(skus[-1], str(SKU.objects.get(Type0='แผ่น24')))
+
+        jobs, more = self.complete('autocomplete_jobs', q='J0', page=2)
+        self.assertEqual((jobs, more), (['J020'], False))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SKUDisplayNameTests(CoilDataMixin, TestCase):
+
+    def test_display_name_is_stored_and_follows_manufacturer(self):
+        self.assertEqual(self.sku.display_name, 'เหล็กแผ่น-2T-1.6x89-FGY-SPHC-SUP-D1')
+
+        self.supplier.name = 'NEW'
+        self.supplier.save()
+        self.sku.refresh_from_db()
+        self.assertEqual(str(self.sku), 'เหล็กแผ่น-2T-1.6x89-FGY-SPHC-NEW-D1')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SKUDimensionTests(CoilDataMixin, TestCase):
+
+    def test_dimensions_are_parsed_and_filtered_numerically(self):
+        wide = SKU.objects.create(
+            Type0='เหล็กแผ่น', thickness='11.6', width='1,219', length='C', manufacturer=self.supplier,
+        )
+        self.assertEqual(self.sku.thickness_mm, Decimal('1.6'))
+        self.assertEqual((wide.width_mm, wide.length_mm), (Decimal('1219'), None))
+
+        def skus(**params):
+            return list(filters.sku_queryset(params).order_by('pk'))
+
+        self.assertEqual(skus(thickness='1.6'), [self.sku])
+        self.assertEqual(skus(thickness='1-12', width='1000-1300'), [wide])
+        self.assertEqual(skus(thickness__gte='2'), [wide])
+        self.assertEqual(skus(width__lt='100'), [self.sku])
+        self.assertEqual(skus(length='C'), [wide])
+
+    def test_every_dimension_filter_branch(self):
+        thin = SKU.objects.create(Type0='เหล็กแผ่น', thickness='1.2', width='1,000', manufacturer=self.supplier)
+        thick = SKU.objects.create(Type0='เหล็กแผ่น', thickness='2.0', width='1,219', length='C', manufacturer=self.supplier)
+
+        def skus(**params):
+            return list(filters.sku_queryset(params).order_by('pk'))
+
+        # Exact, both ends of a range inclusive
+        self.assertEqual(skus(thickness='2'), [thick])
+        self.assertEqual(skus(thickness='1.2-1.6'), [self.sku, thin])
+        self.assertEqual(skus(thickness=' 1.6 - 2.0 '), [self.sku, thick])
+        # Bounds, combined with each other and with the value
+        self.assertEqual(skus(thickness__gt='1.2'), [self.sku, thick])
+        self.assertEqual(skus(thickness__gte='1.2', thickness__lt='2'), [self.sku, thin])
+        self.assertEqual(skus(thickness__lte='1.6', width='1000-1300'), [thin])
+        # A bound that is not a number is ignored
+        self.assertEqual(skus(thickness__gte='thick'), [self.sku, thin, thick])
+        # Text, and a range missing one end, fall back to matching the text
+        self.assertEqual(skus(length='c'), [thick])
+        self.assertEqual(skus(thickness='1.2-'), [])
+        self.assertEqual(skus(thickness='-2'), [])
+        self.assertEqual(skus(thickness='1.2-x'), [])
+        # Thousands separators are dropped before parsing
+        self.assertEqual(skus(width='1,219'), [thick])
+
+    def test_export_follows_the_list_filters(self):
+        SKU.objects.create(Type0='เหล็กม้วน', thickness='2.0', width='1,219', manufacturer=self.supplier)
+        response = self.client.get(reverse('coil:sku_list'), {'thickness__gte': '1.5', 'type0': 'แผ่น'})
+        self.assertEqual(list(response.context['skus']), [self.sku])
+
+        url = f"{reverse('coil:export_sku_csv')}?{response.wsgi_request.GET.urlencode()}"
+        self.assertContains(response, url.replace('&', '&amp;'))
+        content = b''.join(self.client.get(url).streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual([row[0] for row in rows[1:]], ['เหล็กแผ่น'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchIndexTests(CoilDataMixin, TestCase):
+
+    def titles(self, text):
+        return [(result['kind'], result['title']) for result in search.search(text)[0]]
+
+    def test_documents_follow_saves_and_deletes(self):
+        self.create_lots(1, pallets=1, coils=1)
+        Job.objects.create(job_number='J-77', job_name_short='งานพับกล่อง')
+        self.assertEqual(self.titles('K-00000'), [('lot', 'K-00000'), ('pallet', 'PL0-0'), ('coil', 'C00')])
+        self.assertEqual(self.titles('PL0'), [('pallet', 'PL0-0'), ('coil', 'C00')])
+        self.assertEqual(self.titles('j-77'), [('job', 'J-77')])
+
+        # Renaming the lot reaches the pallet and coil documents written by bulk_update
+        coilin = CoilIn.objects.get()
+        coilin.lot = 'Z-1'
+        coilin.save()
+        self.assertEqual(self.titles('K-00000'), [])
+        self.assertEqual(self.titles('Z-1 C00'), [('coil', 'C00')])
+
+        coilin.delete()
+        self.assertEqual(self.titles('Z-1'), [])
+
+    def test_unnamed_supplier_and_owner_are_left_out(self):
+        CoilIn.objects.create(
+            user=self.profile, lot='K-1', supplier=Supplier.objects.create(), owner=self.owner,
+        )
+        self.assertEqual(self.titles('None'), [])
+        self.assertEqual(self.titles('OWN'), [('lot', 'K-1')])
+
+    def test_thai_substrings_fall_back_to_trigrams(self):
+        Job.objects.create(job_number='J-1', job_name_short='งานพับกล่อง')
+        # The word index only knows the whole Thai run; trigrams find the middle of it
+        self.assertEqual(self.titles('งานพับ'), [('job', 'J-1')])
+        self.assertEqual(self.titles('กล่อง'), [('job', 'J-1')])
+        self.assertEqual(self.titles('แผ่น'), [('sku', self.sku.display_name)])
+        self.assertEqual(self.titles('1.6x89'), [('sku', self.sku.display_name)])
+
+    def test_search_is_ranked_and_paginated(self):
+        for i in range(search.PAGE_SIZE + 5):
+            Job.objects.create(job_number=f'J-{i:03d}', job_name_short='K-00000' if i == 3 else '')
+        self.create_lots(1, pallets=1, coils=1)
+
+        # A title match outranks the same words in a job's body
+        self.assertEqual(self.titles('K-00000')[0], ('lot', 'K-00000'))
+
+        response = self.client.get(reverse('coil:search_json'), {'q': 'J'})
+        data = response.json()
+        self.assertEqual(len(data['results']), search.PAGE_SIZE)
+        self.assertTrue(data['pagination']['more'])
+        # Only job managers can open a job
+        self.assertIsNone(data['results'][0]['url'])
+        self.user.groups.add(Group.objects.create(name='SKU_Manager'))
+        data = self.client.get(reverse('coil:search_json'), {'q': 'J', 'page': 2}).json()
+        self.assertEqual(data['results'][0]['url'], reverse('coil:job_update', args=[data['results'][0]['id']]))
+        self.assertEqual(len(data['results']), 5)
+        self.assertFalse(data['pagination']['more'])
+
+        search.rebuild()
+        self.assertEqual(len(self.titles('K-00000')), 4)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BatchLabelTests(CoilDataMixin, TestCase):
+    LABEL = 'class="mb-8 page-break"'
+
+    def labels(self, params):
+        response = self.client.get(reverse('coil:print_labels_batch'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_every_pallet_of_the_picked_lots(self):
+        self.create_lots(3, pallets=2)
+        first, second, third = CoilIn.objects.order_by('pk')
+        content = self.labels({'ids': [first.pk, f'{third.pk},{first.pk}']})
+        self.assertEqual(content.count(self.LABEL), 4)
+        for number in ('PL0-0', 'PL0-1', 'PL2-0', 'PL2-1'):
+            self.assertIn(number, content)
+        self.assertNotIn('PL1-', content)
+
+    def test_unknown_and_malformed_ids_are_ignored(self):
+        self.create_lots(1, pallets=2)
+        coilin = CoilIn.objects.get()
+        content = self.labels({'ids': [coilin.pk, 99999, 'abc', '-1', f'{coilin.pk},,x']})
+        self.assertEqual(content.count(self.LABEL), 2)
+        self.assertEqual(self.labels({'ids': 99999}).count(self.LABEL), 0)
+
+        # Nothing usable picked at all
+        response = self.client.get(reverse('coil:print_labels_batch'), {'ids': 'abc'})
+        self.assertRedirects(response, reverse('coil:label_list'), fetch_redirect_response=False)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LabelPDFTests(CoilDataMixin, TestCase):
+
+    def test_label_font_is_required(self):
+        self.create_lots(1, pallets=1, coils=1)
+        pallets = CoilPallet.objects.for_labels()
+        with override_settings(LABEL_PDF_FONT=None), self.assertRaises(ImproperlyConfigured):
+            labels_pdf.render_pallets(pallets)
+        with override_settings(LABEL_PDF_FONT='/missing/Sarabun.ttf'), self.assertRaises(ImproperlyConfigured):
+            labels_pdf.render_pallets(pallets)
+        with override_settings(LABEL_PDF_FONT=TEST_FONT):
+            self.assertTrue(labels_pdf.render_pallets(pallets).startswith(b'%PDF'))
+
+    @override_settings(LABEL_PDF_FONT=None)
+    def test_pdf_views_are_hidden_without_a_font(self):
+        self.create_lots(1, pallets=1, coils=1)
+        coilin = CoilIn.objects.get()
+        response = self.client.get(reverse('coil:label_list'))
+        self.assertNotContains(response, reverse('coil:print_labels_pdf', args=[coilin.pk]))
+        self.assertNotContains(response, reverse('coil:print_labels_batch_pdf'))
+
+        for url in (reverse('coil:print_labels_pdf', args=[coilin.pk]),
+                    reverse('coil:pallet_label_pdf', args=[CoilPallet.objects.get().pk])):
+            response = self.client.get(url, follow=True)
+            self.assertRedirects(response, reverse('coil:label_list'))
+            self.assertContains(response, 'LABEL_PDF_FONT')
+
+    @override_settings(LABEL_PDF_FONT=TEST_FONT)
+    def test_pages_are_cached_in_the_shared_tier_only(self):
+        self.create_lots(1, pallets=1, coils=1)
+        response = self.client.get(reverse('coil:pallet_label_pdf', args=[CoilPallet.objects.get().pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+        key = labels_pdf.cache_key(labels_pdf.label_data(CoilPallet.objects.for_labels().get()))
+        self.assertIsNotNone(cache.shared.get(key))
+        self.assertFalse(any(labels_pdf.CACHE_PREFIX in local_key for local_key in cache._local))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportTests(CoilDataMixin, TestCase):
+
+    def content(self, url):
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_is_streamed_with_bom_and_every_row(self):
+        self.create_lots(2, pallets=2, coils=3)
+        response, content = self.content(reverse('coil:export_coilnumber_csv'))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=CoilNumber_Export.csv')
+        self.assertTrue(content.startswith('\ufeff'.encode('utf-8')))
+
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0], ['Coil Number', 'Weight (kg)', 'Pallet Number', 'Lot', 'SKU'])
+        self.assertEqual(len(rows), 1 + 12)
+        self.assertIn(['C00', '100.0', 'PL0-0', 'K-00000', str(self.sku)], rows)
+
+    def test_csv_keeps_thai_text(self):
+        response, content = self.content(reverse('coil:export_sku_csv'))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:3], ['Type0', 'Type1', 'Type2'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], 'เหล็กแผ่น')
+
+    def test_xlsx_opens_with_openpyxl(self):
+        self.create_lots(2, pallets=2)
+        response, content = self.content(reverse('coil:export_coilpallet_excel'))
+        self.assertEqual(response['Content-Type'], exports.XLSX_CONTENT_TYPE)
+
+        worksheet = load_workbook(io.BytesIO(content), read_only=True)['CoilPallet']
+        rows = list(worksheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ('Pallet Number', 'Lot', 'SKU', 'Supplier', 'Owner', 'Timestamp'))
+        self.assertEqual(len(rows), 1 + 4)
+        self.assertEqual(rows[1][1:5], ('K-00000', str(self.sku), 'SUP', 'OWN'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CoilFullPathTests(CoilDataMixin, TestCase):
+
+    def test_full_path_follows_lot_and_pallet(self):
+        self.create_lots(1, pallets=1, coils=2)
+        self.assertEqual(str(CoilNumber.objects.first()), 'K-00000-PL0-0-C00')
+
+        pallet = CoilPallet.objects.get()
+        pallet.number = 'PX'
+        pallet.save()
+        coilin = pallet.coilin
+        coilin.lot = 'K-99'
+        coilin.save()
+
+        with self.assertNumQueries(1):
+            paths = [str(coil) for coil in CoilNumber.objects.order_by('pk')]
+        self.assertEqual(paths, ['K-99-PX-C00', 'K-99-PX-C01'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GroupCacheTests(CoilDataMixin, TestCase):
+
+    def test_groups_load_once_and_follow_changes(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(rbac.is_coil_in(self.user))
+            self.assertTrue(rbac.is_coil_out(self.user))
+            self.assertFalse(rbac.is_adjuster(self.user))
+
+        self.user.groups.add(Group.objects.create(name='Adjuster'))
+        self.assertTrue(rbac.is_adjuster(self.user))
+
+    def test_groups_are_cached_across_requests(self):
+        rbac.is_coil_in(self.user)
+
+        # A fresh user object, as on the next request, reads the cache
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(rbac.is_adjuster(user))
+
+        Group.objects.create(name='Adjuster').user_set.add(user)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(rbac.is_adjuster(user))
+
+    def test_changes_made_by_another_worker_apply_at_once(self):
+        adjuster = Group.objects.create(name='Adjuster')
+        self.assertFalse(rbac.is_adjuster(self.user))
+        # Another worker adds the user to the group and bumps the version in the
+        # shared tier; this worker's local tier still holds the old version
+        User.groups.through.objects.create(user=self.user, group=adjuster)
+        cache.shared.incr('rbac:version')
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(rbac.is_adjuster(user))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReferenceChoicesTests(CoilDataMixin, TestCase):
+
+    def test_choices_are_cached_until_a_row_changes(self):
+        self.assertEqual(reference.choices(Supplier), ((self.supplier.pk, 'SUP'),))
+        with self.assertNumQueries(0):
+            reference.choices(Supplier)
+
+        Supplier.objects.create(name='ZZZ')
+        self.assertEqual([label for _, label in reference.choices(Supplier)], ['SUP', 'ZZZ'])
+
+    def test_sku_prefix_matches(self):
+        SKU.objects.create(Type0='ท่อ', Type1='1T', manufacturer=self.supplier)
+        self.assertEqual(reference.prefix_matches(SKU, 'เหล็ก'), ((self.sku.pk, str(self.sku)),))
+        self.assertEqual(reference.prefix_matches(SKU, 'x'), ())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DepartmentMatcherTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cutting = Department.objects.create(name='Slitting Line')
+        self.shearing = Department.objects.create(name='Shearing')
+
+    def test_resolution_order(self):
+        matcher = departments.DepartmentMatcher(
+            [(self.cutting.pk, 'Slitting Line'), (self.shearing.pk, 'Shearing')],
+            [('S9-cut', self.shearing.pk)],
+        )
+        self.assertEqual(matcher.resolve(' shearing '), (self.shearing.pk, True))
+        self.assertEqual(matcher.resolve('S1-Slit'), (self.cutting.pk, False))
+        self.assertEqual(matcher.resolve('s9-CUT'), (self.shearing.pk, True))
+        self.assertEqual(matcher.resolve('2-line'), (self.cutting.pk, False))
+        self.assertEqual(matcher.resolve('Welding'), (None, True))
+        # Matches start at a word of the department name
+        self.assertEqual(matcher.resolve('S1-ting'), (None, True))
+
+    def test_word_match_is_saved_only_when_asked(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(departments.resolve_department('S2-line'), self.cutting.pk)
+        self.assertEqual(departments.resolve_department('S2-line', remember=True), self.cutting.pk)
+        self.assertTrue(ProcessDepartment.objects.filter(process_name='s2-line').exists())
+
+        # A later, better matching department does not change the answer
+        Department.objects.create(name='Line')
+        # Saving it requeued the job steps, which already rebuilt the matcher
+        with self.assertNumQueries(0):
+            self.assertEqual(departments.resolve_department('S2-line'), self.cutting.pk)
+            departments.resolve_department('Shearing')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BatchLookupTests(CoilDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user.groups.add(Group.objects.create(name='Coil_Out'))
+
+    def test_coils_in_one_query_with_etag(self):
+        self.create_lots(1, pallets=2, coils=3)
+        ids = list(CoilNumber.objects.values_list('pk', flat=True))
+        url = reverse('coil:coil_details_batch')
+        params = {'ids': ','.join(map(str, ids + [0]))}
+        self.client.get(url, params)
+
+        # session, user, coils
+        with self.assertNumQueries(3):
+            response = self.client.get(url, params)
+        data = response.json()
+        self.assertEqual(len(data['coils']), 6)
+        self.assertEqual(data['coils'][str(ids[0])]['sku_name'], str(self.sku))
+        self.assertEqual(data['missing'], [0])
+
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_too_many_ids_are_refused(self):
+        url = reverse('coil:job_details_batch')
+        ids = ','.join(map(str, range(1, views.BATCH_LOOKUP_LIMIT + 1)))
+        self.assertEqual(self.client.get(url, {'ids': ids}).status_code, 200)
+        response = self.client.get(url, {'ids': f'{ids},{views.BATCH_LOOKUP_LIMIT + 1}'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class JobProcessTests(CoilDataMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user.groups.add(Group.objects.create(name='SKU_Manager'), Group.objects.create(name='Coil_Out'))
+
+    def formset_data(self, rows, initial=0):
+        data = {'processes-TOTAL_FORMS': len(rows), 'processes-INITIAL_FORMS': initial}
+        for i, row in enumerate(rows):
+            data.update({f'processes-{i}-{key}': value for key, value in row.items()})
+        return data
+
+    def test_steps_are_numbered_in_row_order(self):
+        data = {'job_number': 'J1', **self.formset_data([
+            {'process': 'S1-ตัดแผ่น', 'due_date': '2026-01-05'}, {}, {'process': 'พับ'},
+        ])}
+        response = self.client.post(reverse('coil:job_create'), data)
+        self.assertRedirects(response, reverse('coil:job_list'))
+        job = Job.objects.get()
+        self.assertEqual(list(job.processes.values_list('step', 'process')), [(1, 'S1-ตัดแผ่น'), (2, 'พับ')])
+
+        first, second = job.processes.all()
+        data = {'job_number': 'J1', **self.formset_data([
+            {'id': first.pk, 'process': first.process, 'DELETE': 'on'},
+            {'id': second.pk, 'process': second.process},
+            {'process': 'เจาะ', 'due_date': '2026-01-09'},
+        ], initial=2)}
+        self.client.post(reverse('coil:job_update', args=[job.pk]), data)
+        self.assertEqual(list(job.processes.values_list('step', 'process')), [(1, 'พับ'), (2, 'เจาะ')])
+
+        week = JobProcess.objects.due_between(datetime.date(2026, 1, 5), datetime.date(2026, 1, 11))
+        self.assertEqual(list(week.values_list('process', flat=True)), ['เจาะ'])
+
+        details = self.client.get(reverse('coil:get_job_details', args=[job.pk])).json()
+        self.assertEqual(details['coil_kg'], 'พับ')
+
+
+    def test_migrated_job_reports_its_first_step_before_and_after_renumbering(self):
+        # As migrated from job_process_3 with empty job_process_1/2
+        legacy = Job.objects.create(job_number='J2')
+        first = JobProcess.objects.create(job=legacy, step=3, process='พับ', due_date=datetime.date(2026, 1, 5))
+        second = JobProcess.objects.create(job=legacy, step=5, process='ตัดแผ่น')
+        url = reverse('coil:get_job_details', args=[legacy.pk])
+        before = self.client.get(url).json()
+        self.assertEqual((before['coil_kg'], before['type0']), ('พับ', '2026-01-05'))
+
+        # Saving the job form renumbers the steps 1..n
+        data = {'job_number': 'J2', **self.formset_data([
+            {'id': first.pk, 'process': first.process, 'due_date': '2026-01-05'},
+            {'id': second.pk, 'process': second.process},
+        ], initial=2)}
+        self.client.post(reverse('coil:job_update', args=[legacy.pk]), data)
+        self.assertEqual(list(legacy.processes.values_list('step', 'process')), [(1, 'พับ'), (2, 'ตัดแผ่น')])
+        self.assertEqual(self.client.get(url).json(), before)
+
+    def test_department_changes_requeue_only_affected_steps(self):
+        slitting = Department.objects.create(name='Slitting Line')
+        packing = Department.objects.create(name='Packing')
+        job = Job.objects.create(job_number='J1')
+        by_prefix = JobProcess.objects.create(job=job, step=1, process='S1-line')
+        renamed_to = JobProcess.objects.create(job=job, step=2, process='Cutting')
+        JobProcess.objects.create(job=job, step=3, process='Packing')
+        JobProcess.objects.create(job=job, step=4, process='พับ')
+        self.assertEqual(by_prefix.department, slitting)
+        self.assertIsNone(renamed_to.department)
+
+        # update, departments and mappings for the matcher, the affected steps, their update
+        slitting.name = 'Cutting'
+        with self.assertNumQueries(5):
+            slitting.save()
+        by_prefix.refresh_from_db()
+        renamed_to.refresh_from_db()
+        # 'S1-line' keeps the mapping recorded when it was saved
+        self.assertEqual(by_prefix.department, slitting)
+        self.assertEqual(renamed_to.department, slitting)
+
+        slitting.delete()
+        renamed_to.refresh_from_db()
+        self.assertIsNone(renamed_to.department)
+        self.assertEqual(set(JobProcess.objects.values_list('process', 'department')), {
+            ('S1-line', None), ('Cutting', None), ('Packing', packing.pk), ('พับ', None),
+        })
+
+    def test_mappings_requeue_only_their_steps(self):
+        slitting = Department.objects.create(name='Slitting Line')
+        job = Job.objects.create(job_number='J1')
+        other = JobProcess.objects.create(job=job, step=1, process='Packing')
+        # The word match is recorded without re-resolving the other steps:
+        # the mapping insert in a savepoint, then the step insert
+        with self.assertNumQueries(4):
+            step = JobProcess.objects.create(job=job, step=2, process='S2-Line')
+        self.assertEqual(step.department_id, slitting.pk)
+
+        packing = Department.objects.create(name='Packing')
+        JobProcess.objects.filter(pk=other.pk).update(department=None)
+        mapping = ProcessDepartment.objects.get(process_name='s2-line')
+        mapping.department = packing
+        mapping.save()
+        step.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(step.department_id, packing.pk)
+        # Only steps named like the mapping are re-resolved
+        self.assertIsNone(other.department_id)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ScheduleBoardTests(CoilDataMixin, TestCase):
+
+    def test_steps_are_queued_per_department(self):
+        self.user.groups.add(Group.objects.create(name='Viewer'))
+        cutting = Department.objects.create(name='ตัดแผ่น')
+        job = Job.objects.create(job_number='J1')
+        monday = datetime.date(2026, 1, 5)
+        overdue = JobProcess.objects.create(
+            job=job, step=1, process='S1-ตัดแผ่น', due_date=monday - datetime.timedelta(days=3),
+        )
+        today = JobProcess.objects.create(job=job, step=2, process='พับ', due_date=monday)
+        JobProcess.objects.create(job=job, step=3, process='ตัดแผ่น', due_date=monday, is_done=True)
+        self.assertEqual(overdue.department, cutting)
+        self.assertIsNone(today.department)
+
+        # A new department picks up the open steps it matches
+        folding = Department.objects.create(name='พับ')
+        today.refresh_from_db()
+        self.assertEqual(today.department, folding)
+
+        url = reverse('coil:schedule_board')
+        self.client.get(url, {'week': '2026-01-07'})
+        # session, user, the week, latest overdue steps, overdue counts (departments come from the cache)
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'week': '2026-01-07'})
+        queues = {queue['name']: queue for queue in response.context['queues']}
+        self.assertEqual(response.context['days'][0], monday)
+        self.assertEqual(queues['ตัดแผ่น']['overdue'], [overdue])
+        self.assertEqual(queues['ตัดแผ่น']['days'][0], [])
+        self.assertEqual(queues['พับ']['days'][0], [today])
+
+        # An impossible date falls back to the current week
+        response = self.client.get(url, {'week': '2026-02-31'})
+        self.assertEqual(response.status_code, 200)
+        today = timezone.localdate()
+        self.assertEqual(response.context['days'][0], today - datetime.timedelta(days=today.weekday()))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SQLiteTuningTests(TestCase):
+
+    def test_connections_run_the_tuning_pragmas(self):
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64 * 1024)
+
+
+@override_settings(CACHES=TEST_CACHES, COIL_INSTRUMENTATION=True)
+class RequestTimingTests(CoilDataMixin, TestCase):
+
+    def test_requests_are_timed_per_view(self):
+        view_metrics.reset()
+        response = self.client.get(reverse('coil:coilin_list'), HTTP_X_REQUEST_ID='abc')
+        self.assertEqual(response['X-Request-ID'], 'abc')
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        stats = view_metrics.snapshot()['coil:coilin_list']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreater(stats['queries_per_request'], 0)
+
+    def test_streamed_queries_count_towards_the_request(self):
+        self.create_lots(2)
+        view_metrics.reset()
+        response = self.client.get(reverse('coil:export_coilnumber_csv'))
+        self.assertNotIn('coil:export_coilnumber_csv', view_metrics.snapshot())
+
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            b''.join(response.streaming_content)
+        self.assertGreater(recorder.count, 0)
+        stats = view_metrics.snapshot()['coil:export_coilnumber_csv']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreaterEqual(stats['queries_per_request'], recorder.count)
+
+    @override_settings(COIL_INSTRUMENTATION=False)
+    def test_can_be_switched_off(self):
+        response = self.client.get(reverse('coil:coilin_list'))
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(COIL_SQL_PROFILER=True)
+@override_settings(CACHES=TEST_CACHES)
+class SQLProfilerTests(CoilDataMixin, TestCase):
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            profiler.fingerprint('SELECT * FROM t WHERE id IN (1, 2, 3) AND name = \'x\''),
+            profiler.fingerprint('SELECT *  FROM t WHERE id IN (%s) AND name = %s'),
+        )
+
+    def test_repeated_queries_are_reported_per_url_name(self):
+        profiler.stats.reset()
+        self.create_lots(1, pallets=3)
+        recorder = profiler.ProfilingRecorder()
+        with connection.execute_wrapper(recorder):
+            for pallet in CoilPallet.objects.all():
+                pallet.coilin.lot
+        profiler.stats.observe('n_plus_one', recorder)
+        self.client.get(reverse('coil:coilin_list'))
+
+        self.user.is_staff = True
+        self.user.save()
+        data = self.client.get(reverse('coil:sql_profile_json')).json()
+        self.assertTrue(data['enabled'])
+        views = {view['url_name']: view for view in data['views']}
+        self.assertEqual(set(views), {'n_plus_one', 'coil:coilin_list'})
+        self.assertEqual(views['n_plus_one']['repeated_queries'][0]['max_per_request'], 3)
+        self.assertEqual(views['coil:coilin_list']['repeated_queries'], [])
+        self.assertEqual(self.client.get(reverse('coil:sql_profile')).status_code, 200)
+
+    def test_streamed_label_page_is_profiled(self):
+        profiler.stats.reset()
+        self.create_lots(2)
+        ids = list(CoilIn.objects.values_list('pk', flat=True))
+        response = self.client.get(reverse('coil:print_labels_batch'), {'ids': ids})
+        recorder = profiler.ProfilingRecorder()
+        with connection.execute_wrapper(recorder):
+            b''.join(response.streaming_content)
+        self.assertGreater(recorder.count, 0)
+
+        views = {view['url_name']: view for view in profiler.stats.snapshot()['views']}
+        self.assertGreaterEqual(views['coil:print_labels_batch']['queries'], recorder.count)
+
+@override_settings(CACHES=TEST_CACHES, LABEL_PDF_FONT=TEST_FONT)
+class QueryBudgetTests(TestCase):
+    """
+    Upper bounds on queries and render time for every URL in coil/urls.py,
+    on a fixed synthetic dataset (20 lots, 80 pallets, 400 coils). The
+    counts are what the pages run today once caches are warm; a per-row
+    query added to any of them overshoots by dozens and the failure lists
+    the repeated query shapes.
+    """
+    COILS = 400
+    # url name -> most queries allowed; session and user are two of them
+    QUERY_BUDGETS = {
+        'index': 2,
+        'coilin_list': 4,
+        'coilin_create': 2,
+        'coilin_detail': 5,
+        'coilin_update': 3,
+        'coilin_delete': 3,
+        'add_pallet': 3,
+        'edit_pallet': 5,
+        'print_labels': 5,
+        'print_labels_pdf': 5,
+        'pallet_label_pdf': 4,
+        'label_list': 4,
+        'print_labels_batch': 4,
+        'print_labels_batch_pdf': 4,
+        'coilout_list': 3,
+        'coilout_create': 2,
+        'coilout_detail': 3,
+        'coilout_update': 5,
+        'coilout_delete': 4,
+        'get_coil_sku': 3,
+        'get_job_details': 4,
+        'coil_details_batch': 3,
+        'job_details_batch': 3,
+        'request_metrics': 2,
+        'sql_profile': 2,
+        'sql_profile_json': 2,
+        'autocomplete_coil_numbers': 3,
+        'autocomplete_skus': 2,
+        'autocomplete_jobs': 3,
+        'search': 3,
+        'search_json': 3,
+        'job_list': 3,
+        'job_create': 2,
+        'job_update': 4,
+        'job_delete': 3,
+        'schedule_board': 5,
+        'sku_list': 3,
+        'coilpallet_list': 3,
+        'coilnumber_list': 3,
+        'export_sku_excel': 3,
+        'export_sku_csv': 3,
+        'export_coilpallet_excel': 3,
+        'export_coilpallet_csv': 3,
+        'export_coilnumber_excel': 3,
+        'export_coilnumber_csv': 3,
+    }
+    # Render time allowed, generous so that slow CI machines do not fail
+    TIME_BUDGET_MS = 2000
+    EXPORT_TIME_BUDGET_MS = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.generate(cls.COILS)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.get(username='benchmark'))
+
+    def url_for(self, pattern):
+        coilin = CoilIn.objects.order_by('pk').first()
+        pallet = coilin.coilpallet_set.order_by('pk').first()
+        args = {
+            'pk': {
+                'coilin': coilin.pk, 'add_pallet': coilin.pk, 'edit_pallet': coilin.pk,
+                'print_labels': coilin.pk, 'pallet_label_pdf': pallet.pk,
+                'coilout': CoilOut.objects.order_by('pk').first().pk,
+                'get_coil_sku': CoilNumber.objects.order_by('pk').first().pk,
+                'get_job_details': Job.objects.order_by('pk').first().pk,
+                'job': Job.objects.order_by('pk').first().pk,
+            },
+            'pallet_pk': {'edit_pallet': pallet.pk},
+        }
+        kwargs = {}
+        for key in pattern.pattern.converters:
+            kwargs[key] = next(value for prefix, value in args[key].items() if pattern.name.startswith(prefix))
+        url = reverse(f'coil:{pattern.name}', kwargs=kwargs)
+        query = {
+            'print_labels_batch': f'ids={coilin.pk}',
+            'print_labels_batch_pdf': f'ids={coilin.pk}',
+            'coil_details_batch': 'ids=' + ','.join(map(str, CoilNumber.objects.values_list('pk', flat=True)[:50])),
+            'job_details_batch': 'ids=' + ','.join(map(str, Job.objects.values_list('pk', flat=True)[:20])),
+            'autocomplete_coil_numbers': 'q=K-00',
+            'autocomplete_skus': 'q=เหล็ก',
+            'autocomplete_jobs': 'q=J00',
+            'search': 'q=K-00',
+            'search_json': 'q=เหล็ก',
+        }.get(pattern.name)
+        return f'{url}?{query}' if query else url
+
+    def measure(self, url):
+        recorder = profiler.ProfilingRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, recorder, (time.perf_counter() - start) * 1000
+
+    def test_every_url_stays_within_budget(self):
+        for pattern in coil_urls.urlpatterns:
+            with self.subTest(pattern.name):
+                self.assertIn(pattern.name, self.QUERY_BUDGETS, 'new URL without a query budget')
+                url = self.url_for(pattern)
+                self.client.get(url)
+                response, recorder, elapsed_ms = self.measure(url)
+                self.assertLess(response.status_code, 400)
+
+                budget = self.QUERY_BUDGETS[pattern.name]
+                if recorder.count > budget:
+                    shapes = '\n'.join(
+                        f'  x{count} {shape}' for shape, count in recorder.shapes.most_common(10)
+                    )
+                    self.fail(f'{url} ran {recorder.count} queries (budget {budget}):\n{shapes}')
+
+                limit = self.EXPORT_TIME_BUDGET_MS if pattern.name.startswith('export_') else self.TIME_BUDGET_MS
+                self.assertLess(elapsed_ms, limit, f'{url} took {elapsed_ms:.0f} ms')
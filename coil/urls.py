@@ -16,7 +16,11 @@ urlpatterns = [
     path('coilin/<int:pk>/add-pallet/', views.add_pallet, name='add_pallet'),
     path('coilin/<int:pk>/edit-pallet/<int:pallet_pk>/', views.add_pallet, name='edit_pallet'),
     path('coilin/<int:pk>/print-labels/', views.print_labels, name='print_labels'),
+    path('coilin/<int:pk>/print-labels.pdf', views.print_labels_pdf, name='print_labels_pdf'),
+    path('coilpallet/<int:pk>/label.pdf', views.pallet_label_pdf, name='pallet_label_pdf'),
     path('labels/', views.label_list, name='label_list'),
+    path('labels/print/', views.print_labels_batch, name='print_labels_batch'),
+    path('labels/print.pdf', views.print_labels_batch_pdf, name='print_labels_batch_pdf'),
     path('coilout/', views.CoilOutListView.as_view(), name='coilout_list'),
     path('coilout/create/', views.CoilOutCreateView.as_view(), name='coilout_create'),
     path('coilout/<int:pk>/', views.CoilOutDetailView.as_view(), name='coilout_detail'),
@@ -24,12 +28,23 @@ urlpatterns = [
     path('coilout/<int:pk>/delete/', views.CoilOutDeleteView.as_view(), name='coilout_delete'),
     path('api/get-sku/<int:pk>/', views.get_coil_sku, name='get_coil_sku'),
     path('api/get-job-details/<int:pk>/', views.get_job_details, name='get_job_details'),
+    path('api/coils/', views.coil_details_batch, name='coil_details_batch'),
+    path('api/jobs/', views.job_details_batch, name='job_details_batch'),
+    path('api/metrics/', views.request_metrics, name='request_metrics'),
+    path('profiler/', views.sql_profile, name='sql_profile'),
+    path('api/profiler/', views.sql_profile_json, name='sql_profile_json'),
+    path('api/autocomplete/coil-numbers/', views.autocomplete_coil_numbers, name='autocomplete_coil_numbers'),
+    path('api/autocomplete/skus/', views.autocomplete_skus, name='autocomplete_skus'),
+    path('api/autocomplete/jobs/', views.autocomplete_jobs, name='autocomplete_jobs'),
+    path('search/', views.global_search, name='search'),
+    path('api/search/', views.search_json, name='search_json'),
     
     # Job URLs
     path('jobs/', views.JobListView.as_view(), name='job_list'),
     path('jobs/create/', views.JobCreateView.as_view(), name='job_create'),
     path('jobs/<int:pk>/update/', views.JobUpdateView.as_view(), name='job_update'),
     path('jobs/<int:pk>/delete/', views.JobDeleteView.as_view(), name='job_delete'),
+    path('jobs/schedule/', views.schedule_board, name='schedule_board'),
 
     # List Views for Export
     path('sku/', views.SKUListView.as_view(), name='sku_list'),
@@ -1,34 +1,30 @@
+import datetime
+import hashlib
+import logging
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import CreateView, DetailView, ListView
 from django.urls import reverse
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import user_passes_test
-from django.db.models import Sum, Q 
-from .models import CoilIn, CoilPallet, CoilOut, CoilNumber, Job, SKU
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, Sum, Q, Window
+from django.db.models.functions import RowNumber
+from .models import CoilIn, CoilPallet, CoilOut, CoilNumber, Department, Job, JobProcess, SKU
 from django.contrib import messages
-from .forms import CoilInForm, CoilPalletForm, CoilNumberFormSet, CoilOutForm, SKUForm, JobForm
-
-def has_group(user, group_names):
-    if user.is_superuser:
-        return True
-    if isinstance(group_names, str):
-        group_names = [group_names]
-    return user.groups.filter(name__in=group_names).exists()
-
-def is_sku_manager(user):
-    return has_group(user, 'SKU_Manager')
-
-def is_coil_in(user):
-    return has_group(user, 'Coil_In')
-
-def is_coil_out(user):
-    return has_group(user, ['Coil_Out', 'Coil_In'])
-
-def is_adjuster(user):
-    return has_group(user, 'Adjuster')
-
-def is_viewer(user):
-    return has_group(user, ['Viewer', 'Coil_In', 'Coil_Out', 'Adjuster', 'SKU_Manager']) or user.is_authenticated
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .forms import CoilInForm, CoilPalletForm, CoilNumberFormSet, CoilOutForm, SKUForm, JobForm, JobProcessFormSet
+from . import exports, filters, labels_pdf, profiler, reference, search
+from .departments import resolve_department
+from .instrumentation import view_metrics
+from .rbac import is_adjuster, is_coil_in, is_coil_out, is_sku_manager, is_viewer
+
+logger = logging.getLogger(__name__)
 
 # Create your views here.
 def index(request):
@@ -49,7 +45,16 @@ def index(request):
 
 @user_passes_test(is_viewer)
 def coilin_list(request):
-    coils = CoilIn.objects.all().order_by('-timestamp1')
+    # One query for the lots (with totals) and one for all of their pallets
+    pallets = (CoilPallet.objects
+               .select_related('type0')
+               .annotate(coil_count=Count('coilnumber'), total_weight=Sum('coilnumber__weight'))
+               .order_by('number'))
+    coils = (CoilIn.objects
+             .select_related('user__user', 'supplier', 'owner')
+             .prefetch_related(Prefetch('coilpallet_set', queryset=pallets))
+             .with_totals()
+             .order_by('-timestamp1'))
     return render(request, 'coil/coilin_list.html', {'coils': coils})
 
 class CoilInCreateView(UserPassesTestMixin, CreateView):
@@ -68,8 +73,6 @@ class CoilInCreateView(UserPassesTestMixin, CreateView):
     def get_success_url(self):
         return reverse('coil:coilin_detail', kwargs={'pk': self.object.pk})
 
-from django.db.models import Sum
-
 class CoilInDetailView(UserPassesTestMixin, DetailView):
     model = CoilIn
     template_name = 'coil/coilin_detail.html'
@@ -78,12 +81,17 @@ class CoilInDetailView(UserPassesTestMixin, DetailView):
     def test_func(self):
         return is_viewer(self.request.user)
 
+    def get_queryset(self):
+        # The lot with its total weight, then all pallets and all coils: three queries
+        return (CoilIn.objects
+                .select_related('supplier', 'owner')
+                .prefetch_related(Prefetch('coilpallet_set', queryset=CoilPallet.objects.select_related('type0')),
+                                  'coilpallet_set__coilnumber_set')
+                .with_totals())
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Calculate total weight of all coils in this lot
-        # coil -> coilpallet_set -> coilnumber_set
-        total_weight = CoilNumber.objects.filter(coilpallet__coilin=self.object).aggregate(Sum('weight'))['weight__sum']
-        context['total_weight'] = total_weight or 0
+        context['total_weight'] = self.object.total_weight
         return context
 
 @user_passes_test(is_coil_in)
@@ -133,31 +141,127 @@ def add_pallet(request, pk, pallet_pk=None):
         'pallet': pallet
     })
 
+LABELS_PER_PAGE = 30
+LABEL_BATCH_CHUNK_SIZE = 200
+
 @user_passes_test(is_viewer)
 def print_labels(request, pk):
     coil = get_object_or_404(CoilIn, pk=pk)
-    pallets = coil.coilpallet_set.all()
+    pallets = CoilPallet.objects.filter(coilin=coil).for_labels().order_by('pk')
+    return render(request, 'coil/print_label.html', {'coil': coil, 'pallets': pallets})
 
-    # Pre-calculate totals for each pallet
-    for pallet in pallets:
-        coil_numbers = pallet.coilnumber_set.all()
-        pallet.total_weight = sum([c.weight for c in coil_numbers if c.weight])
-        pallet.total_count = coil_numbers.count()
-        pallet.all_coils = coil_numbers # accessible in template simply
+def _parse_ids(values):
+    """Accept ?ids=1&ids=2 as well as ?ids=1,2 and drop anything non-numeric."""
+    ids = []
+    for value in values:
+        ids.extend(int(part) for part in value.split(',') if part.strip().isdigit())
+    return ids
 
-    return render(request, 'coil/print_label.html', {'coil': coil, 'pallets': pallets})
+def _batch_label_pallets(request):
+    """
+    Pallets of the lots picked with ``ids`` and/or ``date_from``/``date_to``
+    (coil-in date), ready for label rendering. None when nothing was picked.
+    """
+    ids = _parse_ids(request.GET.getlist('ids'))
+    try:
+        date_from = parse_date(request.GET.get('date_from') or '')
+        date_to = parse_date(request.GET.get('date_to') or '')
+    except ValueError:
+        date_from = date_to = None
+
+    if not (ids or date_from or date_to):
+        return None
+
+    coils = CoilIn.objects.all()
+    if ids:
+        coils = coils.filter(pk__in=ids)
+    if date_from:
+        coils = coils.filter(timestamp1__date__gte=date_from)
+    if date_to:
+        coils = coils.filter(timestamp1__date__lte=date_to)
+
+    return (CoilPallet.objects
+            .filter(coilin__in=coils)
+            .for_labels()
+            .order_by('coilin__timestamp1', 'coilin', 'pk'))
 
-def label_list(request):
-    """Display all labels with their coils and pallets"""
-    coils = CoilIn.objects.all().order_by('-timestamp2')
+@user_passes_test(is_viewer)
+def print_labels_batch(request):
+    """
+    Print the labels of many lots in one document.
 
-    # Pre-calculate pallet info for each coil
-    for coil in coils:
-        pallets = coil.coilpallet_set.all()
-        coil.pallet_count = pallets.count()
-        coil.total_coils = sum([p.coilnumber_set.count() for p in pallets])
+    Lots are chosen with ``ids`` and/or a ``date_from``/``date_to`` range on
+    the coil-in date. All pallets and coils are loaded with one prefetch and
+    the labels are streamed to the browser as they are rendered.
+    """
+    pallets = _batch_label_pallets(request)
+    if pallets is None:
+        messages.error(request, 'กรุณาเลือกล็อตหรือช่วงวันที่ที่ต้องการพิมพ์')
+        return redirect('coil:label_list')
+
+    label_template = get_template('coil/_pallet_label.html')
+
+    def generate():
+        yield render_to_string('coil/_label_head.html', request=request)
+        for pallet in pallets.iterator(chunk_size=LABEL_BATCH_CHUNK_SIZE):
+            yield label_template.render({'pallet': pallet}, request)
+        yield render_to_string('coil/_label_foot.html', request=request)
+
+    return StreamingHttpResponse(generate(), content_type='text/html; charset=utf-8')
+
+def _pdf_unavailable(request):
+    messages.error(request, 'ยังไม่ได้ตั้งค่าฟอนต์สำหรับพิมพ์ Label เป็น PDF (LABEL_PDF_FONT)')
+    return redirect('coil:label_list')
+
+def _pdf_response(pdf, filename):
+    if pdf is None:
+        raise Http404('No pallets to print')
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename={filename}'
+    return response
 
-    return render(request, 'coil/label_list.html', {'coils': coils})
+@user_passes_test(is_viewer)
+def pallet_label_pdf(request, pk):
+    """PDF label for a single pallet (reprints are served from the render cache)"""
+    if not labels_pdf.is_available():
+        return _pdf_unavailable(request)
+    pallets = CoilPallet.objects.filter(pk=pk).for_labels()
+    return _pdf_response(labels_pdf.render_pallets(pallets), f'Label_{pk}.pdf')
+
+@user_passes_test(is_viewer)
+def print_labels_pdf(request, pk):
+    """PDF labels for every pallet of one lot"""
+    if not labels_pdf.is_available():
+        return _pdf_unavailable(request)
+    coil = get_object_or_404(CoilIn, pk=pk)
+    pallets = CoilPallet.objects.filter(coilin=coil).for_labels().order_by('pk')
+    return _pdf_response(labels_pdf.render_pallets(pallets), f'Labels_{coil.pk}.pdf')
+
+@user_passes_test(is_viewer)
+def print_labels_batch_pdf(request):
+    """PDF labels for many lots, picked the same way as print_labels_batch"""
+    if not labels_pdf.is_available():
+        return _pdf_unavailable(request)
+    pallets = _batch_label_pallets(request)
+    if pallets is None:
+        messages.error(request, 'กรุณาเลือกล็อตหรือช่วงวันที่ที่ต้องการพิมพ์')
+        return redirect('coil:label_list')
+    return _pdf_response(labels_pdf.render_pallets(pallets), 'Labels.pdf')
+
+def label_list(request):
+    """Display all labels with their coils and pallets"""
+    # Pallet/coil counts and weights come from subqueries, one query per page
+    coils = (CoilIn.objects
+             .select_related('supplier', 'owner')
+             .with_totals()
+             .order_by('-timestamp2', '-pk'))
+    page_obj = Paginator(coils, LABELS_PER_PAGE).get_page(request.GET.get('page'))
+
+    return render(request, 'coil/label_list.html', {
+        'coils': page_obj,
+        'page_obj': page_obj,
+        'label_pdf': labels_pdf.is_available(),
+    })
 
 class CoilOutCreateView(UserPassesTestMixin, CreateView):
     model = CoilOut
@@ -176,15 +280,57 @@ class CoilOutCreateView(UserPassesTestMixin, CreateView):
         return reverse('coil:coilout_list')
 
 class CoilOutListView(ListView):
+    """
+    Coil-out records, newest first, paged with a keyset cursor.
+
+    The cursor (``?after=<timestamp2>_<id>``) points at the last row of the
+    previous page, so every page is a range scan on coilout_ts2_id_idx no
+    matter how deep into the history it is.
+    """
     model = CoilOut
     template_name = 'coil/coilout_list.html'
     context_object_name = 'coilouts'
-    ordering = ['-timestamp2']
+    page_size = 50
+
+    def get_queryset(self):
+        queryset = (CoilOut.objects
+                    .select_related('coil_number', 'sku',
+                                    'job', 'department_cutting')
+                    .order_by('-timestamp2', '-id'))
+
+        cursor = self.get_cursor()
+        if cursor:
+            timestamp, pk = cursor
+            queryset = queryset.filter(Q(timestamp2__lt=timestamp) | Q(timestamp2=timestamp, id__lt=pk))
+        return queryset
+
+    def get_cursor(self):
+        try:
+            timestamp, pk = self.request.GET.get('after', '').split('_')
+            timestamp, pk = parse_date(timestamp), int(pk)
+        except (TypeError, ValueError):
+            return None
+        # parse_date returns None for text that is not a date at all
+        return (timestamp, pk) if timestamp else None
+
+    def get_context_data(self, **kwargs):
+        # Fetch one extra row to know whether there is a next page
+        rows = list(self.object_list[:self.page_size + 1])
+        has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        context = super().get_context_data(object_list=rows, **kwargs)
+        context['is_first_page'] = self.get_cursor() is None
+        if has_next:
+            last = rows[-1]
+            context['next_cursor'] = f'{last.timestamp2.isoformat()}_{last.pk}'
+        return context
 
 class CoilOutDetailView(UserPassesTestMixin, DetailView):
     model = CoilOut
     template_name = 'coil/coilout_detail.html'
     context_object_name = 'coilout'
+    queryset = CoilOut.objects.select_related('user__user', 'coil_number', 'sku', 'department_cutting')
     
     def test_func(self):
         return is_viewer(self.request.user)
@@ -214,76 +360,192 @@ class CoilInDeleteView(UserPassesTestMixin, DeleteView):
         return is_adjuster(self.request.user)
 
 from django.http import JsonResponse
-from .models import CoilNumber
+
+# Most ids accepted by one batch lookup
+BATCH_LOOKUP_LIMIT = 200
+
+def _coil_details(ids):
+    """SKU and weight data for the given coil ids, keyed by id, in one query"""
+    rows = CoilNumber.objects.filter(pk__in=ids).values_list(
+        'pk', 'weight', 'remaining_weight', 'status',
+        'coilpallet__type0_id', 'coilpallet__type0__display_name',
+    )
+    return {
+        pk: {
+            'sku_id': sku_id,
+            'sku_name': sku_name,
+            'weight': weight,
+            'remaining_weight': remaining_weight,
+            'status': status,
+        }
+        for pk, weight, remaining_weight, status, sku_id, sku_name in rows
+    }
+
+def _job_details(ids):
+    """Name, quantity and department data for the given job ids, keyed by id, in one query"""
+    # The first step by order: migrated jobs may start at a later step until
+    # the job form renumbers them from 1, and the answer must not change then
+    first_step = JobProcess.objects.filter(job=OuterRef('pk')).order_by('step')[:1]
+    rows = (Job.objects.filter(pk__in=ids)
+            .annotate(process=Subquery(first_step.values('process')),
+                      process_due=Subquery(first_step.values('due_date')))
+            .values_list('pk', 'job_name_short', 'job_qty', 'process', 'process_due'))
+    return {
+        pk: {
+            'job_name_short': name or '',
+            'job_qty': qty or '',
+            # Department matching the first process step (Cutting process)
+            'department_id': resolve_department(process) if process else None,
+            'coil_kg': process or '',  # น้ำหนัก (kg) from the first process step
+            'type0': duefin or '',  # ประเภท from the first step's due date
+        }
+        for pk, name, qty, process, duefin in rows
+    }
+
+def _json_with_etag(request, payload):
+    """JSON response with an ETag of its body; 304 when the client already has it"""
+    response = JsonResponse(payload)
+    etag = f'"{hashlib.sha1(response.content).hexdigest()}"'
+    response['ETag'] = etag
+    # Let the browser keep the body but revalidate every time
+    response['Cache-Control'] = 'private, no-cache'
+    return get_conditional_response(request, etag=etag, response=response)
+
+def _batch_lookup(request, key, details):
+    ids = _parse_ids(request.GET.getlist('ids'))
+    if len(ids) > BATCH_LOOKUP_LIMIT:
+        # Refused rather than cut short, so the client never mistakes dropped ids for missing ones
+        return JsonResponse({'error': f'At most {BATCH_LOOKUP_LIMIT} ids per request'}, status=400)
+    found = details(ids)
+    logger.debug('%s lookup: %d requested, %d found', key, len(ids), len(found),
+                 extra={'lookup': key, 'requested': len(ids), 'found': len(found)})
+    return _json_with_etag(request, {
+        key: {str(pk): data for pk, data in found.items()},
+        'missing': [pk for pk in ids if pk not in found],
+    })
 
 @user_passes_test(is_coil_out)
 def get_coil_sku(request, pk):
     """API endpoint to get SKU for a coil number (AJAX requests only)"""
-    print(f"DEBUG: get_coil_sku called for pk={pk} by user {request.user}")
-    try:
-        coil_number = CoilNumber.objects.get(pk=pk)
-        sku_id = coil_number.coilpallet.type0.id
-        # Also return the name for better debugging or if needed
-        sku_name = str(coil_number.coilpallet.type0)
-        weight = coil_number.weight
-        print(f"DEBUG: Found SKU {sku_name} (ID: {sku_id}), Weight: {weight}")
-        return JsonResponse({'sku_id': sku_id, 'sku_name': sku_name, 'weight': weight})
-    except CoilNumber.DoesNotExist:
-        print(f"DEBUG: CoilNumber {pk} not found")
+    data = _coil_details([pk]).get(pk)
+    if data is None:
+        logger.info('coil %s not found', pk, extra={'coil_id': pk})
         return JsonResponse({'error': 'Coil not found'}, status=404)
-    except Exception as e:
-        print(f"DEBUG: Error in get_coil_sku: {e}")
-        return JsonResponse({'error': str(e)}, status=500)
+    logger.debug('coil %s -> sku %s', pk, data['sku_id'], extra={'coil_id': pk, 'sku_id': data['sku_id']})
+    return _json_with_etag(request, data)
 
 @user_passes_test(is_coil_out)
 def get_job_details(request, pk):
     """API endpoint to get Job details (name, qty, department) for a job number (AJAX requests only)"""
-    try:
-        job = Job.objects.get(pk=pk)
-        department_id = None
-
-        # Try to find a department matching job_process_1 (Cutting process)
-        if job.job_process_1:
-            from .models import Department
-            try:
-                # Trimming whitespace
-                process_name = job.job_process_1.strip()
-
-                # Try exact match first (case-insensitive)
-                department = Department.objects.filter(name__iexact=process_name).first()
-
-                # If not found, try partial match with key words
-                if not department:
-                    # Extract keywords from process name (remove common prefixes like S1-, S2-, etc.)
-                    import re
-                    # Remove pattern like S1-, S2-, 1-, 2- etc at the beginning
-                    cleaned_process = re.sub(r'^[sS]?\d+-?', '', process_name).strip()
-                    print(f"DEBUG: Searching department. Original: '{process_name}', Cleaned: '{cleaned_process}'")
-
-                    # Try to find department containing the cleaned keyword
-                    if cleaned_process:
-                        department = Department.objects.filter(name__icontains=cleaned_process).first()
-
-                if department:
-                    department_id = department.id
-                    print(f"DEBUG: Found department ID {department_id}: {department.name}")
-                else:
-                    print(f"DEBUG: No department found for process: {process_name}")
-
-            except Exception as e:
-                print(f"Error finding department: {e}")
-
-        return JsonResponse({
-            'job_name_short': job.job_name_short or '',
-            'job_qty': job.job_qty or '',
-            'department_id': department_id,
-            'coil_kg': job.job_process_1 or '',  # น้ำหนัก (kg) from job_process_1
-            'type0': job.job_process_1_duefin or ''  # ประเภท from job_process_1_duefin
-        })
-    except Job.DoesNotExist:
+    data = _job_details([pk]).get(pk)
+    if data is None:
+        logger.info('job %s not found', pk, extra={'job_id': pk})
         return JsonResponse({'error': 'Job not found'}, status=404)
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+    logger.debug('job %s -> department %s', pk, data['department_id'],
+                 extra={'job_id': pk, 'department_id': data['department_id']})
+    return _json_with_etag(request, data)
+
+@user_passes_test(is_coil_out)
+def coil_details_batch(request):
+    """SKU and weight data for ``?ids=1,2,3`` coils in one response"""
+    return _batch_lookup(request, 'coils', _coil_details)
+
+@user_passes_test(is_coil_out)
+def job_details_batch(request):
+    """Name, quantity and department data for ``?ids=1,2,3`` jobs in one response"""
+    return _batch_lookup(request, 'jobs', _job_details)
+
+AUTOCOMPLETE_PAGE_SIZE = 20
+
+def _page_number(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return 1
+
+def _autocomplete_response(request, queryset, to_result):
+    """Select2-style page of ``{id, text}`` results; ``to_result`` maps a row to (id, text)"""
+    page = _page_number(request)
+    start = (page - 1) * AUTOCOMPLETE_PAGE_SIZE
+    # Fetch one extra row to know whether there is another page
+    rows = list(queryset[start:start + AUTOCOMPLETE_PAGE_SIZE + 1])
+    return JsonResponse({
+        'results': [{'id': pk, 'text': text} for pk, text in map(to_result, rows[:AUTOCOMPLETE_PAGE_SIZE])],
+        'pagination': {'more': len(rows) > AUTOCOMPLETE_PAGE_SIZE},
+    })
+
+@user_passes_test(is_coil_out)
+def autocomplete_coil_numbers(request):
+    """In-stock coil numbers matching ``?q=`` as a lot, pallet or coil number prefix"""
+    term = request.GET.get('q', '').strip()
+    coils = CoilNumber.objects.available()
+    if term:
+        coils = coils.filter(
+            filters.prefix_q('full_path', term) |
+            filters.prefix_q('coilpallet__number', term) |
+            filters.prefix_q('number', term)
+        ).order_by('full_path')
+    else:
+        coils = coils.order_by('-pk')
+    return _autocomplete_response(request, coils.values_list('pk', 'full_path'), tuple)
+
+@user_passes_test(is_coil_out)
+def autocomplete_skus(request):
+    """SKUs whose code starts with ``?q=``, served from the cached SKU list"""
+    term = request.GET.get('q', '').strip()
+    skus = reference.prefix_matches(SKU, term) if term else reference.choices(SKU)
+    return _autocomplete_response(request, skus, tuple)
+
+@user_passes_test(is_coil_out)
+def autocomplete_jobs(request):
+    """Jobs whose job number starts with ``?q=``"""
+    term = request.GET.get('q', '').strip()
+    jobs = Job.objects.all()
+    if term:
+        jobs = jobs.filter(filters.prefix_q('job_number', term)).order_by('job_number')
+    else:
+        jobs = jobs.order_by('-pk')
+    rows = jobs.values_list('pk', 'job_number')
+    return _autocomplete_response(request, rows, lambda row: (row[0], row[1] or 'Job Without Number'))
+
+SEARCH_KIND_LABELS = {'sku': 'SKU', 'lot': 'ล็อต', 'pallet': 'พาเลท', 'coil': 'ม้วนเหล็ก', 'job': 'Job'}
+
+def _search_url(user, kind, target):
+    """Page a hit opens, or None when ``user`` may not open it"""
+    if kind == 'sku':
+        return f"{reverse('coil:coilpallet_list')}?sku_id={target}"
+    if kind == 'job':
+        # Jobs only have the edit page
+        return reverse('coil:job_update', args=[target]) if is_sku_manager(user) else None
+    # Lots, pallets and coils all open the lot
+    return reverse('coil:coilin_detail', args=[target])
+
+def _search_results(request):
+    """(term, page, results, more) for ``?q=`` and ``?page=``"""
+    term = request.GET.get('q', '').strip()
+    page = _page_number(request)
+    results, more = search.search(term, page)
+    for result in results:
+        result['label'] = SEARCH_KIND_LABELS[result['kind']]
+        result['url'] = _search_url(request.user, result['kind'], result['target'])
+    return term, page, results, more
+
+@user_passes_test(is_viewer)
+def global_search(request):
+    """Ranked search over SKUs, lots, pallets, coils and jobs"""
+    term, page, results, more = _search_results(request)
+    return render(request, 'coil/search.html', {'q': term, 'page': page, 'results': results, 'more': more})
+
+@user_passes_test(is_viewer)
+def search_json(request):
+    """JSON page of the same results as global_search"""
+    term, page, results, more = _search_results(request)
+    return JsonResponse({
+        'results': [
+            {key: result[key] for key in ('kind', 'label', 'id', 'title', 'body', 'url')} for result in results
+        ],
+        'pagination': {'page': page, 'more': more},
+    })
 
 class CoilOutUpdateView(UserPassesTestMixin, UpdateView):
     model = CoilOut
@@ -314,7 +576,27 @@ class JobListView(UserPassesTestMixin, ListView):
     def test_func(self):
         return is_sku_manager(self.request.user)
 
-class JobCreateView(UserPassesTestMixin, CreateView):
+class JobProcessFormSetMixin:
+    """Edit the job's process steps together with the job"""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if 'formset' not in context:
+            context['formset'] = JobProcessFormSet(self.request.POST or None, instance=self.object)
+        return context
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object() if 'pk' in kwargs else None
+        form = self.get_form()
+        formset = JobProcessFormSet(request.POST, instance=self.object)
+        if form.is_valid() and formset.is_valid():
+            self.object = form.save()
+            formset.instance = self.object
+            formset.save()
+            return redirect(self.get_success_url())
+        return self.render_to_response(self.get_context_data(form=form, formset=formset))
+
+class JobCreateView(JobProcessFormSetMixin, UserPassesTestMixin, CreateView):
     model = Job
     form_class = JobForm
     template_name = 'coil/job_form.html'
@@ -323,7 +605,7 @@ class JobCreateView(UserPassesTestMixin, CreateView):
     def test_func(self):
         return is_sku_manager(self.request.user)
 
-class JobUpdateView(UserPassesTestMixin, UpdateView):
+class JobUpdateView(JobProcessFormSetMixin, UserPassesTestMixin, UpdateView):
     model = Job
     form_class = JobForm
     template_name = 'coil/job_form.html'
@@ -340,293 +622,160 @@ class JobDeleteView(UserPassesTestMixin, DeleteView):
     def test_func(self):
         return is_sku_manager(self.request.user)
 
-# List Views for Export
+SCHEDULE_DAYS = 7
+# Open steps due this long before the week are shown as overdue, the most recent ones first
+SCHEDULE_OVERDUE_DAYS = 28
+SCHEDULE_OVERDUE_SHOWN = 20
+
+@user_passes_test(is_viewer)
+def schedule_board(request):
+    """
+    Open job steps of one week (``?week=`` any day in it) per department,
+    with the most recent of the steps that were due in the four weeks
+    before it as overdue.
+
+    Each step carries the department its process resolved to when it was
+    saved, so the week and the overdue steps are range scans on
+    (is_done, due_date); ``?department=`` narrows them to one queue.
+    """
+    try:
+        start = parse_date(request.GET.get('week') or '')
+    except ValueError:
+        # Well formed but impossible, e.g. 2026-02-31
+        start = None
+    start = start or timezone.localdate()
+    start -= datetime.timedelta(days=start.weekday())
+    days = [start + datetime.timedelta(days=n) for n in range(SCHEDULE_DAYS)]
+    overdue_range = (start - datetime.timedelta(days=SCHEDULE_OVERDUE_DAYS), start - datetime.timedelta(days=1))
+
+    open_steps = (JobProcess.objects.filter(is_done=False)
+                  .select_related('job')
+                  .only('step', 'process', 'due_date', 'department', 'job__job_number'))
+    departments = reference.choices(Department)
+    selected = _parse_ids([request.GET.get('department', '')])[:1]
+    if selected:
+        open_steps = open_steps.filter(department_id=selected[0])
+        departments = [(pk, name) for pk, name in departments if pk == selected[0]]
+
+    def new_queue(name):
+        return {'name': name, 'overdue': [], 'more_overdue': 0, 'days': [[] for _ in days]}
+
+    queues = {pk: new_queue(name) for pk, name in departments}
+
+    def queue_for(department_id):
+        if department_id not in queues:
+            queues[department_id] = new_queue('ไม่ระบุแผนก')
+        return queues[department_id]
+
+    for step in open_steps.filter(due_date__range=(days[0], days[-1])).order_by('due_date', 'job_id', 'step'):
+        queue_for(step.department_id)['days'][(step.due_date - start).days].append(step)
+
+    overdue = open_steps.filter(due_date__range=overdue_range)
+    latest_first = (overdue
+                    .annotate(rank=Window(RowNumber(), partition_by=F('department'),
+                                          order_by=[F('due_date').desc(), F('job_id'), F('step')]))
+                    .filter(rank__lte=SCHEDULE_OVERDUE_SHOWN)
+                    .order_by('-due_date', 'job_id', 'step'))
+    for step in latest_first:
+        queue_for(step.department_id)['overdue'].append(step)
+    for department_id, count in overdue.order_by().values_list('department').annotate(n=Count('pk')):
+        queue = queue_for(department_id)
+        queue['more_overdue'] = count - len(queue['overdue'])
+
+    return render(request, 'coil/schedule_board.html', {
+        'days': days,
+        'queues': queues.values(),
+        'departments': reference.choices(Department),
+        'selected_department': selected[0] if selected else None,
+        'previous_week': start - datetime.timedelta(days=SCHEDULE_DAYS),
+        'next_week': start + datetime.timedelta(days=SCHEDULE_DAYS),
+    })
+
+
 # List Views for Export
 class SKUListView(UserPassesTestMixin, ListView):
     model = SKU
     template_name = 'coil/sku_list.html'
     context_object_name = 'skus'
-    ordering = ['Type0', 'Type1']
 
     def test_func(self):
         return is_viewer(self.request.user)
-        
+
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Filtering
-        q = self.request.GET.get('q')
-        type0 = self.request.GET.get('type0')
-        thickness = self.request.GET.get('thickness')
-        width = self.request.GET.get('width')
-        
-        if q:
-            queryset = queryset.filter(
-                Q(Type0__icontains=q) |
-                Q(Type1__icontains=q) |
-                Q(note1__icontains=q) |
-                Q(grade__icontains=q)
-            )
-        
-        if type0:
-            queryset = queryset.filter(Type0__icontains=type0)
-        
-        if thickness:
-            queryset = queryset.filter(thickness__icontains=thickness)
-            
-        if width:
-            queryset = queryset.filter(width__icontains=width)
-            
-        return queryset
+        return filters.sku_queryset(self.request.GET)
 
 class CoilPalletListView(UserPassesTestMixin, ListView):
     model = CoilPallet
     template_name = 'coil/coilpallet_list.html'
     context_object_name = 'pallets'
-    ordering = ['-coilin__timestamp1']
 
     def test_func(self):
         return is_viewer(self.request.user)
 
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('coilin', 'type0', 'coilin__supplier')
-        
-        # Filtering
-        q = self.request.GET.get('q') # General search (Lot, Pallet Number)
-        sku = self.request.GET.get('sku')
-        
-        if q:
-            queryset = queryset.filter(
-                Q(number__icontains=q) |
-                Q(coilin__lot__icontains=q)
-            )
-            
-        if sku:
-             queryset = queryset.filter(
-                Q(type0__Type0__icontains=sku) |
-                Q(type0__thickness__icontains=sku) |
-                Q(type0__width__icontains=sku)
-             )
-            
-        return queryset
+        return filters.coilpallet_queryset(self.request.GET)
 
 class CoilNumberListView(UserPassesTestMixin, ListView):
     model = CoilNumber
     template_name = 'coil/coilnumber_list.html'
     context_object_name = 'coilnumbers'
-    ordering = ['coilpallet__number', 'number']
 
     def test_func(self):
         return is_viewer(self.request.user)
 
     def get_queryset(self):
-        queryset = super().get_queryset().select_related('coilpallet', 'coilpallet__coilin', 'coilpallet__type0')
-        
-        # Filtering
-        q = self.request.GET.get('q') # General search (Coil Number, Pallet Number, Lot)
-        
-        if q:
-            queryset = queryset.filter(
-                Q(number__icontains=q) |
-                Q(coilpallet__number__icontains=q) |
-                Q(coilpallet__coilin__lot__icontains=q)
-            )
-            
-        return queryset
+        return filters.coilnumber_queryset(self.request.GET)
 
 # Export Views
-from django.http import HttpResponse
-import csv
-import openpyxl
-from openpyxl.styles import Font, Alignment
 
 @user_passes_test(is_viewer)
 def export_sku_excel(request):
     """Export SKU data to Excel file"""
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    )
-    response['Content-Disposition'] = 'attachment; filename=SKU_Export.xlsx'
-
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'SKU'
-
-    # Define headers
-    headers = ['Type0', 'Type1', 'Type2', 'Thickness', 'Width', 'Length',
-               'Color', 'Grade', 'Manufacturer', 'Note1', 'Note2']
-
-    # Write headers with styling
-    for col_num, header in enumerate(headers, 1):
-        cell = worksheet.cell(row=1, column=col_num)
-        cell.value = header
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    # Write data
-    skus = SKU.objects.all().select_related('manufacturer')
-    for row_num, sku in enumerate(skus, 2):
-        worksheet.cell(row=row_num, column=1).value = sku.Type0
-        worksheet.cell(row=row_num, column=2).value = sku.Type1
-        worksheet.cell(row=row_num, column=3).value = sku.Type2
-        worksheet.cell(row=row_num, column=4).value = sku.thickness
-        worksheet.cell(row=row_num, column=5).value = sku.width
-        worksheet.cell(row=row_num, column=6).value = sku.length
-        worksheet.cell(row=row_num, column=7).value = sku.color
-        worksheet.cell(row=row_num, column=8).value = sku.grade
-        worksheet.cell(row=row_num, column=9).value = str(sku.manufacturer)
-        worksheet.cell(row=row_num, column=10).value = sku.note1
-        worksheet.cell(row=row_num, column=11).value = sku.note2
-
-    workbook.save(response)
-    return response
+    return exports.SKU_EXPORT.xlsx_response(filters.sku_queryset(request.GET))
 
 @user_passes_test(is_viewer)
 def export_sku_csv(request):
     """Export SKU data to CSV file (Google Sheets compatible)"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=SKU_Export.csv'
-
-    # Write BOM for Excel compatibility with UTF-8
-    response.write('\ufeff'.encode('utf8'))
-
-    writer = csv.writer(response)
-
-    # Write headers
-    writer.writerow(['Type0', 'Type1', 'Type2', 'Thickness', 'Width', 'Length',
-                     'Color', 'Grade', 'Manufacturer', 'Note1', 'Note2'])
-
-    # Write data
-    skus = SKU.objects.all().select_related('manufacturer')
-    for sku in skus:
-        writer.writerow([
-            sku.Type0, sku.Type1, sku.Type2, sku.thickness, sku.width,
-            sku.length, sku.color, sku.grade, str(sku.manufacturer),
-            sku.note1, sku.note2
-        ])
-
-    return response
+    return exports.SKU_EXPORT.csv_response(filters.sku_queryset(request.GET))
 
 @user_passes_test(is_viewer)
 def export_coilpallet_excel(request):
     """Export CoilPallet data to Excel file"""
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    )
-    response['Content-Disposition'] = 'attachment; filename=CoilPallet_Export.xlsx'
-
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'CoilPallet'
-
-    # Define headers
-    headers = ['Pallet Number', 'Lot', 'SKU', 'Supplier', 'Owner', 'Timestamp']
-
-    # Write headers with styling
-    for col_num, header in enumerate(headers, 1):
-        cell = worksheet.cell(row=1, column=col_num)
-        cell.value = header
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    # Write data
-    pallets = CoilPallet.objects.all().select_related('coilin', 'type0', 'coilin__supplier', 'coilin__owner')
-    for row_num, pallet in enumerate(pallets, 2):
-        worksheet.cell(row=row_num, column=1).value = pallet.number
-        worksheet.cell(row=row_num, column=2).value = pallet.coilin.lot if pallet.coilin else ''
-        worksheet.cell(row=row_num, column=3).value = str(pallet.type0)
-        worksheet.cell(row=row_num, column=4).value = str(pallet.coilin.supplier) if pallet.coilin and pallet.coilin.supplier else ''
-        worksheet.cell(row=row_num, column=5).value = str(pallet.coilin.owner) if pallet.coilin and pallet.coilin.owner else ''
-        worksheet.cell(row=row_num, column=6).value = str(pallet.coilin.timestamp1) if pallet.coilin and pallet.coilin.timestamp1 else ''
-
-    workbook.save(response)
-    return response
+    return exports.COILPALLET_EXPORT.xlsx_response(filters.coilpallet_queryset(request.GET))
 
 @user_passes_test(is_viewer)
 def export_coilpallet_csv(request):
     """Export CoilPallet data to CSV file (Google Sheets compatible)"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=CoilPallet_Export.csv'
-
-    # Write BOM for Excel compatibility with UTF-8
-    response.write('\ufeff'.encode('utf8'))
-
-    writer = csv.writer(response)
-
-    # Write headers
-    writer.writerow(['Pallet Number', 'Lot', 'SKU', 'Supplier', 'Owner', 'Timestamp'])
-
-    # Write data
-    pallets = CoilPallet.objects.all().select_related('coilin', 'type0', 'coilin__supplier', 'coilin__owner')
-    for pallet in pallets:
-        writer.writerow([
-            pallet.number,
-            pallet.coilin.lot if pallet.coilin else '',
-            str(pallet.type0),
-            str(pallet.coilin.supplier) if pallet.coilin and pallet.coilin.supplier else '',
-            str(pallet.coilin.owner) if pallet.coilin and pallet.coilin.owner else '',
-            str(pallet.coilin.timestamp1) if pallet.coilin and pallet.coilin.timestamp1 else ''
-        ])
-
-    return response
+    return exports.COILPALLET_EXPORT.csv_response(filters.coilpallet_queryset(request.GET))
 
 @user_passes_test(is_viewer)
 def export_coilnumber_excel(request):
     """Export CoilNumber data to Excel file"""
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    )
-    response['Content-Disposition'] = 'attachment; filename=CoilNumber_Export.xlsx'
-
-    workbook = openpyxl.Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'CoilNumber'
-
-    # Define headers
-    headers = ['Coil Number', 'Weight (kg)', 'Pallet Number', 'Lot', 'SKU']
-
-    # Write headers with styling
-    for col_num, header in enumerate(headers, 1):
-        cell = worksheet.cell(row=1, column=col_num)
-        cell.value = header
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
-
-    # Write data
-    coils = CoilNumber.objects.all().select_related('coilpallet', 'coilpallet__coilin', 'coilpallet__type0')
-    for row_num, coil in enumerate(coils, 2):
-        worksheet.cell(row=row_num, column=1).value = coil.number
-        worksheet.cell(row=row_num, column=2).value = coil.weight
-        worksheet.cell(row=row_num, column=3).value = coil.coilpallet.number if coil.coilpallet else ''
-        worksheet.cell(row=row_num, column=4).value = coil.coilpallet.coilin.lot if coil.coilpallet and coil.coilpallet.coilin else ''
-        worksheet.cell(row=row_num, column=5).value = str(coil.coilpallet.type0) if coil.coilpallet and coil.coilpallet.type0 else ''
-
-    workbook.save(response)
-    return response
+    return exports.COILNUMBER_EXPORT.xlsx_response(filters.coilnumber_queryset(request.GET))
 
 @user_passes_test(is_viewer)
 def export_coilnumber_csv(request):
     """Export CoilNumber data to CSV file (Google Sheets compatible)"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename=CoilNumber_Export.csv'
-
-    # Write BOM for Excel compatibility with UTF-8
-    response.write('\ufeff'.encode('utf8'))
-
-    writer = csv.writer(response)
+    return exports.COILNUMBER_EXPORT.csv_response(filters.coilnumber_queryset(request.GET))
 
-    # Write headers
-    writer.writerow(['Coil Number', 'Weight (kg)', 'Pallet Number', 'Lot', 'SKU'])
+@staff_member_required
+def request_metrics(request):
+    """Per-view latency histograms and query counts of this worker process"""
+    return JsonResponse({'views': view_metrics.snapshot()})
 
-    # Write data
-    coils = CoilNumber.objects.all().select_related('coilpallet', 'coilpallet__coilin', 'coilpallet__type0')
-    for coil in coils:
-        writer.writerow([
-            coil.number,
-            coil.weight,
-            coil.coilpallet.number if coil.coilpallet else '',
-            coil.coilpallet.coilin.lot if coil.coilpallet and coil.coilpallet.coilin else '',
-            str(coil.coilpallet.type0) if coil.coilpallet and coil.coilpallet.type0 else ''
-        ])
+@staff_member_required
+def sql_profile(request):
+    """Dashboard of the SQL profiler; POST clears the collected statistics"""
+    if request.method == 'POST':
+        profiler.stats.reset()
+        messages.success(request, 'ล้างสถิติแล้ว')
+        return redirect('coil:sql_profile')
+    return render(request, 'coil/sql_profile.html', {
+        'enabled': profiler.is_enabled(),
+        'profile': profiler.stats.snapshot(),
+    })
 
-    return response
+@staff_member_required
+def sql_profile_json(request):
+    """SQL profiler statistics per URL name"""
+    return JsonResponse({'enabled': profiler.is_enabled(), **profiler.stats.snapshot()})
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'coil.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,6 +42,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'coil.profiler.SQLProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
@@ -104,6 +106,42 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Label PDF rendering
+# TrueType font with Thai glyphs (e.g. Sarabun) for PDF labels; required to render them.
+LABEL_PDF_FONT = os.environ.get('LABEL_PDF_FONT')
+# Worker processes used to render large label batches
+LABEL_PDF_WORKERS = int(os.environ.get('LABEL_PDF_WORKERS', 4))
+
+# Cache
+# In-process LRU (coil.cache.TieredCache) in front of a file cache shared by all workers
+CACHES = {
+    'default': {
+        'BACKEND': 'coil.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_ENTRIES', 1000)),
+            # Seconds a worker may serve an entry before re-reading the shared tier
+            'LOCAL_TIMEOUT': int(os.environ.get('CACHE_LOCAL_TIMEOUT', 5)),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Request instrumentation (coil/instrumentation.py): timing, query counts and
+# per-view latency histograms. Off here, and so in development, tests and the
+# benchmark; prod.py turns it on. When off the middleware drops out of the stack.
+COIL_INSTRUMENTATION = os.environ.get('COIL_INSTRUMENTATION', 'False') == 'True'
+# Requests slower than this are logged as warnings
+COIL_SLOW_REQUEST_MS = int(os.environ.get('COIL_SLOW_REQUEST_MS', 1000))
+COIL_LOG_LEVEL = os.environ.get('COIL_LOG_LEVEL', 'INFO')
+# Opt-in SQL profiler (coil/profiler.py): query counts and repeated query shapes per URL name
+COIL_SQL_PROFILER = os.environ.get('COIL_SQL_PROFILER', 'False') == 'True'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
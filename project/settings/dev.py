@@ -6,6 +6,7 @@ Inherits all settings from base.py.
 """
 
 from .base import *
+from .database import sqlite_database
 
 # SECURITY WARNING: don't run with debug turned on in production!
 # DEBUG and ALLOWED_HOSTS are now controlled by base.py and .env
@@ -14,11 +15,9 @@ from .base import *
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# runserver handles each request in a new thread, so persistent connections stay off
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
 }
 
 
@@ -35,21 +34,30 @@ if 'debug_toolbar' in INSTALLED_APPS:
 # Email backend for development (prints to console)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
-# Disable caching in development
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
-}
-
 # Logging configuration for development
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'coil.instrumentation.RequestIdFilter',
+        },
+    },
+    'formatters': {
+        'coil': {
+            'format': '{levelname} {request_id} {name} {message}',
+            'style': '{',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
         },
+        'coil_console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['request_id'],
+            'formatter': 'coil',
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -61,5 +69,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'coil': {
+            'handlers': ['coil_console'],
+            'level': COIL_LOG_LEVEL,
+            'propagate': False,
+        },
     },
 }
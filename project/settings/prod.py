@@ -7,6 +7,7 @@ Inherits all settings from base.py.
 
 import os
 from .base import *
+from .database import sqlite_database
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
@@ -19,12 +20,15 @@ DEBUG = False
 # Update with your production database settings
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(
+        BASE_DIR / 'db.sqlite3',
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+    ),
 }
 
+# Request timing and per-view metrics (coil/instrumentation.py)
+COIL_INSTRUMENTATION = os.environ.get('COIL_INSTRUMENTATION', 'True') == 'True'
+
 
 # Security settings for production
 
@@ -87,13 +91,28 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@yourdomain.co
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'coil.instrumentation.RequestIdFilter',
+        },
+    },
     'formatters': {
         'verbose': {
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'coil.instrumentation.JsonFormatter',
+        },
     },
     'handlers': {
+        'coil_file': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'logs' / 'coil.jsonl',
+            'filters': ['request_id'],
+            'formatter': 'json',
+        },
         'file': {
             'level': 'WARNING',
             'class': 'logging.FileHandler',
@@ -116,6 +135,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'coil': {
+            'handlers': ['coil_file'],
+            'level': COIL_LOG_LEVEL,
+            'propagate': False,
+        },
     },
 }
 